@@ -0,0 +1,177 @@
+"""
+benchmarks of matrix generation on synthetic matrices, results are written as json
+
+    python benchmarks/bench_matrix.py --sizes 100 10000 1000000 --dimensions 2 3 6 --output results.json
+
+each record contains benchmark name, requested size, number of dimensions and values, number of generated
+combinations, the best time of repeats [s] and peak of allocated memory [B] (peak RSS of pytest process
+for 'collect' benchmark)
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+import tracemalloc
+
+from pytest_matrix import TestMatrixMixin
+from pytest_matrix.mixin import FixtureGrouper
+
+
+COLLECT_SCRIPT = """
+import resource
+import sys
+
+import pytest
+
+exit_code = pytest.main(sys.argv[1:])
+print('max_rss', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+"""
+
+
+def get_matrix(size, dimensions):
+    """
+    :return: fixture names and values with approximately `size` combinations (values are simple fixtures)
+    """
+    values = max(2, round(size ** (1 / dimensions)))
+    names = ['dim%s' % dimension for dimension in range(dimensions)]
+    return names, {name: ['#%s' % value for value in range(values)] for name in names}
+
+
+def measure(function, repeat):
+    """
+    :return: (result, the best time, peak of allocated memory) of function
+    """
+    best = None
+    peak = 0
+    result = None
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = function()
+        duration = time.perf_counter() - start
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        best = duration if best is None else min(best, duration)
+    return result, best, peak
+
+
+def bench_class_creation(names, group, repeat):
+    def create():
+        dct = {'FN_FIXTURES': [group], 'FN_FIXTURES_NAMES': names, 'test_fn': lambda self: None,
+               '__module__': __name__}
+        return type('TestBench', (TestMatrixMixin,), dct)
+    _, best, peak = measure(create, repeat)
+    return None, best, peak
+
+
+def bench_parametrize_data(names, group, repeat):
+    def generate():
+        data = FixtureGrouper(names, [group]).get_parametrize_data(names)
+        return sum(1 for _ in data['argvalues'])
+    return measure(generate, repeat)
+
+
+def bench_difference(names, group, repeat):
+    """
+    difference of full product and groups, where each value of the first dimension misses one value
+    of the second dimension
+    """
+    first, second = names[0], names[1]
+    groups = [dict(group, **{first: [value], second: group[second][:index] + group[second][index + 1:]})
+              for index, value in enumerate(group[first])]
+
+    def difference():
+        return len(FixtureGrouper(names, [group]).difference(FixtureGrouper(names, groups)))
+    return measure(difference, repeat)
+
+
+def bench_collect(names, group, repeat):
+    source = textwrap.dedent("""
+    import pytest
+
+    @pytest.mark.matrix(names={names!r}, combs=[{group!r}])
+    def test_bench({arguments}):
+        pass
+    """).format(names=names, group=group, arguments=', '.join(names))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'test_bench.py')
+        with open(path, 'w') as f:
+            f.write(source)
+        best = None
+        peak = 0
+        combinations = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = subprocess.run([sys.executable, '-c', COLLECT_SCRIPT, '--collect-only', '-q',
+                                     '-p', 'no:cacheprovider', path],
+                                    stdout=subprocess.PIPE, universal_newlines=True, check=True, cwd=directory)
+            duration = time.perf_counter() - start
+            lines = output.stdout.splitlines()
+            combinations = sum(1 for line in lines if '::test_bench[' in line)
+            peak = max(peak, int(lines[-1].split()[-1]))
+            best = duration if best is None else min(best, duration)
+    return combinations, best, peak
+
+
+BENCHMARKS = {
+    'class': bench_class_creation,
+    'parametrize': bench_parametrize_data,
+    'difference': bench_difference,
+    'collect': bench_collect,
+}
+
+
+def run(benchmarks, sizes, dimensions, repeat, max_collect):
+    records = []
+    for size in sizes:
+        for dimension_count in dimensions:
+            names, group = get_matrix(size, dimension_count)
+            combinations = len(group[names[0]]) ** dimension_count
+            for name in benchmarks:
+                if name == 'collect' and combinations > max_collect:
+                    continue
+                if name == 'difference' and dimension_count < 2:
+                    continue
+                result, best, peak = BENCHMARKS[name](names, group, repeat)
+                records.append({
+                    'benchmark': name,
+                    'size': size,
+                    'dimensions': dimension_count,
+                    'values': len(group[names[0]]),
+                    'combinations': combinations,
+                    'result': result,
+                    'time': best,
+                    'peak_memory': peak,
+                })
+                print("{name:<12} {combinations:>9} combinations {dimension_count:>2} dimensions "
+                      "{best:>9.4f}s {peak:>12}B".format_map(vars()), file=sys.stderr)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--benchmarks', nargs='+', choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10 ** 2, 10 ** 4, 10 ** 6],
+                        help="approximate number of combinations")
+    parser.add_argument('--dimensions', nargs='+', type=int, default=[2, 3, 6],
+                        help="number of fixture names")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-collect', type=int, default=10 ** 5,
+                        help="skip end-to-end collection of bigger matrices")
+    parser.add_argument('--output', default=None, help="json file, stdout by default")
+    args = parser.parse_args(argv)
+
+    records = run(args.benchmarks, args.sizes, args.dimensions, args.repeat, args.max_collect)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(records, f, indent=2)
+    else:
+        json.dump(records, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import itertools
+import time
+
+from _pytest.python import Function
+from _pytest.reports import TestReport
+from _pytest.runner import runtestprotocol
+
+
+class Batch:
+    """
+    parameter value of batch item (one item for `size` combinations of matrix test)
+    """
+
+    ID_PREFIX = 'batch'
+
+    def __init__(self, index, size):
+        self.index = index
+        self.size = size
+
+    @property
+    def id(self):
+        return "{}{}".format(self.ID_PREFIX, self.index)
+
+    def __repr__(self):
+        return "Batch({self.index}, {self.size})".format_map(vars())
+
+    def get_parameter_sets(self, parameter_sets):
+        """
+        :param parameter_sets: `ParameterSets` of the test function
+        :return: parameter sets of this batch
+        """
+        if self.size is None:
+            return parameter_sets.get(0)
+        return parameter_sets.get(self.index * self.size, (self.index + 1) * self.size)
+
+
+class ParameterSets:
+    """
+    parameter sets (`FixtureGrouper.generate_parameter_sets`) shared by batches of one test function,
+    batches run one after another read the generator only once, it is created again only when
+    earlier batch is requested
+    """
+
+    def __init__(self, generate):
+        self.generate = generate
+        self.iterator = None
+        self.position = 0
+
+    def get(self, start, stop=None):
+        if self.iterator is None or start < self.position:
+            self.iterator = iter(self.generate())
+            self.position = 0
+        for _ in itertools.islice(self.iterator, start - self.position):
+            self.position += 1
+        while stop is None or self.position < stop:
+            parameter_set = next(self.iterator, None)
+            if parameter_set is None:
+                return
+            self.position += 1
+            yield parameter_set
+
+
+def get_batches(count, size):
+    """
+    :param size: True (one batch for all combinations) or number of combinations of one batch
+    """
+    if size is True:
+        return [Batch(0, None)]
+    return [Batch(index, size) for index in range(max(1, -(-count // size)))]
+
+
+def get_batch(item, fixture_names):
+    callspec = getattr(item, 'callspec', None)
+    if callspec is None or not fixture_names:
+        return None
+    value = callspec.params.get(fixture_names[0])
+    return value if isinstance(value, Batch) else None
+
+
+def create_combination_item(item, batch, fixture_names, parameter_set):
+    """
+    create (not collected) item of one combination of batch item, it has same node id as item generated
+    without batch
+    """
+    callspec = item.callspec.copy()
+    callspec.params.update(zip(fixture_names, parameter_set.values))
+    index = callspec._idlist.index(batch.id)
+    callspec._idlist[index] = parameter_set.id
+    return Function.from_parent(item.parent, name="{}[{}]".format(item.originalname, callspec.id),
+                                callspec=callspec, callobj=item.obj, fixtureinfo=item._fixtureinfo,
+                                keywords={callspec.id: True}, originalname=item.originalname)
+
+
+def run_batch(item, nextitem, batch, fixture_names, parameter_sets, run_protocol=None):
+    """
+    run combinations of batch item one after another as separate items, reports of passed combinations
+    are dropped, so memory does not grow with number of combinations
+
+    :param run_protocol: function(item, nextitem) returning reports, `runtestprotocol` by default
+    :return: generator of reports of each failed and skipped combination (they are added to number
+        of collected tests) and at the end passed report of batch item with summary of combinations
+        (failures are reported only by the combinations, like subtests)
+    """
+    if run_protocol is None:
+        def run_protocol(combination_item, next_item):
+            return runtestprotocol(combination_item, log=False, nextitem=next_item)
+    counts = {'passed': 0, 'failed': 0, 'skipped': 0}
+    failed = []
+    start = time.time()
+    combination_items = (create_combination_item(item, batch, fixture_names, parameter_set)
+                         for parameter_set in batch.get_parameter_sets(parameter_sets))
+    current = next(combination_items, None)
+    while current is not None and not (item.session.shouldfail or item.session.shouldstop):
+        following = next(combination_items, None)
+        reports = run_protocol(current, item.parent if following is not None else nextitem)
+        outcome = get_outcome(reports)
+        counts[outcome] += 1
+        if outcome != 'passed':
+            item.session.testscollected += 1
+            if outcome == 'failed':
+                failed.append(current.callspec.id)
+            yield reports
+        current = following
+    if current is not None:
+        item.session._setupstate.teardown_exact(item, nextitem)
+    summary = "{passed} passed, {failed} failed, {skipped} skipped combinations".format_map(counts)
+    if failed:
+        summary = "{}, failed: {}".format(summary, ', '.join(failed))
+    yield [TestReport(item.nodeid, item.location, {name: 1 for name in item.keywords}, 'passed', None, 'call',
+                      sections=[('matrix batch', summary)], duration=time.time() - start)]
+
+
+def get_outcome(reports):
+    if any(report.failed for report in reports):
+        return 'failed'
+    if any(report.skipped for report in reports):
+        return 'skipped'
+    return 'passed'
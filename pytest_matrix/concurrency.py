@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from pytest_lazyfixture import is_lazy_fixture
+
+
+def get_fixture_closure(request, name):
+    """
+    :return: names of all fixtures, which fixture depends on (without fixture itself)
+    """
+    closure = set()
+    stack = [name]
+    while stack:
+        fixturedefs = request._arg2fixturedefs.get(stack.pop())
+        if not fixturedefs:
+            continue
+        for argname in fixturedefs[-1].argnames:
+            if argname != 'request' and argname not in closure:
+                closure.add(argname)
+                stack.append(argname)
+    return closure
+
+
+def get_independent_fixtures(request, names):
+    """
+    :return: (independent, dependencies), independent are lazy fixtures no other of them depends on,
+        dependencies are fixtures they depend on
+    """
+    closures = {name: get_fixture_closure(request, name) for name in names}
+    independent = [name for name in names if not any(name in closures[other] for other in names if other != name)]
+    dependencies = set().union(*(closures[name] for name in independent)).difference(independent)
+    return independent, dependencies
+
+
+def prefetch_fixtures(item, max_workers=None):
+    """
+    set up values of lazy fixtures of generated test in thread pool
+
+    autouse fixtures and fixtures the lazy fixtures depend on are set up first (in main thread), so threads only
+    call the lazy fixtures and their finalizers are registered after finalizers of their dependencies
+    """
+    request = item._request
+    names = [value.name for value in item.callspec.params.values() if is_lazy_fixture(value)]
+    independent, dependencies = get_independent_fixtures(request, names)
+    if len(independent) < 2:
+        return
+    autouse = request._fixturemanager._getautousenames(item.parent.nodeid)
+    for name in autouse + sorted(dependencies.difference(autouse)):
+        request.getfixturevalue(name)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(request.getfixturevalue, name) for name in independent]
+    for future in futures:
+        future.result()
@@ -0,0 +1,129 @@
+import inspect
+
+from . import exceptions
+
+
+class Constraints:
+    """
+    rules excluding invalid combinations, rule is dict of fixture name and its values or function
+    with fixture names as arguments
+
+    exclude: combination matching any rule is not generated
+        {'db': ['sqlite'], 'isolation': ['serializable']}  -> sqlite with serializable isolation is excluded
+        lambda db, isolation: db == 'sqlite' and isolation == 'serializable'
+
+    require: combination must match every rule
+        {'db': ['postgres', 'mysql']}
+        lambda db, pool: db != 'sqlite' or pool == 'single'
+
+    functions get values as they are written in _FIXTURES
+    """
+
+    OPTIONS = ('exclude', 'require')
+
+    def __init__(self, exclude=None, require=None):
+        self.exclude = self.get_rules_list(exclude)
+        self.require = self.get_rules_list(require)
+
+    def __bool__(self):
+        return bool(self.exclude or self.require)
+
+    @staticmethod
+    def get_rules_list(rules):
+        if rules is None:
+            return []
+        if isinstance(rules, dict) or callable(rules):
+            return [rules]
+        return list(rules)
+
+    @classmethod
+    def validate(cls, option, rules, fixture_names=None):
+        if not isinstance(rules, (dict, list, tuple)) and not callable(rules):
+            raise exceptions.InvalidGrouperOption(option, "must be dict, function or list of them")
+        for rule in cls.get_rules_list(rules):
+            if isinstance(rule, dict):
+                if not all(isinstance(values, (list, tuple, set)) for values in rule.values()):
+                    raise exceptions.InvalidGrouperOption(option, "values of rule must be list of fixture values")
+                names = rule
+            elif callable(rule):
+                names = get_argument_names(rule)
+            else:
+                raise exceptions.InvalidGrouperOption(option, "rule must be dict or function, not: "
+                                                      "'{rule.__class__.__name__}'".format_map(vars()))
+            if fixture_names is not None and names is not None:
+                unknown = set(names).difference(fixture_names)
+                if unknown:
+                    raise exceptions.InvalidGrouperOption(option, "unknown fixture names: " +
+                                                          ', '.join(sorted(unknown)))
+
+    def get_row_rules(self, fixture_names, values):
+        """
+        :param values: values of each fixture name in one group
+        :return: list of (columns, allowed), allowed(row) is True when row of value indexes passes the rule,
+            only columns of the rule are set in row
+        """
+        columns = {name: column for column, name in enumerate(fixture_names)}
+        rules = []
+        for rule in self.exclude:
+            if isinstance(rule, dict):
+                excluded = [(columns[name], get_indexes(values[columns[name]], rule_values))
+                            for name, rule_values in rule.items()]
+                rules.append(([column for column, _ in excluded],
+                              lambda row, excluded=excluded: not all(row[c] in indexes for c, indexes in excluded)))
+            else:
+                rules.append(get_function_rule(rule, fixture_names, columns, values, negate=True))
+        for rule in self.require:
+            if isinstance(rule, dict):
+                # every fixture name of the rule is checked separately, so combination is pruned
+                # as soon as one of them has wrong value
+                for name, rule_values in rule.items():
+                    column = columns[name]
+                    indexes = get_indexes(values[column], rule_values)
+                    rules.append(([column], lambda row, c=column, indexes=indexes: row[c] in indexes))
+            else:
+                rules.append(get_function_rule(rule, fixture_names, columns, values, negate=False))
+        return rules
+
+
+def get_argument_names(function):
+    """
+    :return: names of function arguments or None when function accepts any keyword arguments
+    """
+    parameters = inspect.signature(function).parameters.values()
+    if any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters):
+        return None
+    return [parameter.name for parameter in parameters
+            if parameter.kind in (parameter.POSITIONAL_OR_KEYWORD, parameter.KEYWORD_ONLY)]
+
+
+def get_function_rule(function, fixture_names, columns, values, negate):
+    names = get_argument_names(function)
+    if names is None:
+        names = fixture_names
+    arguments = [(name, columns[name]) for name in names]
+
+    def allowed(row):
+        return negate != bool(function(**{name: values[c][row[c]] for name, c in arguments}))
+    return [c for _, c in arguments], allowed
+
+
+def get_indexes(values, rule_values):
+    return frozenset(index for index, value in enumerate(values) if value in rule_values)
+
+
+def get_depth_checks(rules, permutation):
+    """
+    :param rules: rules from `Constraints.get_row_rules`
+    :param permutation: order in which columns are set
+    :return: list of rules for each depth, rule is checked as soon as all its columns are set
+    """
+    depths = {column: depth for depth, column in enumerate(permutation)}
+    checks = [[] for _ in permutation]
+    for rule_columns, allowed in rules:
+        depth = max((depths[column] for column in rule_columns), default=0)
+        checks[depth].append(allowed)
+    return checks
+
+
+def is_allowed(row, rules):
+    return all(allowed(row) for _, allowed in rules)
@@ -0,0 +1,115 @@
+import html
+import itertools
+import json
+from collections import Counter, defaultdict
+
+
+class CoverReport:
+    """
+    coverage of fixture values by all generated tests of the session, fixtures with same name in different tests
+    are same dimension
+
+    report contains number of combinations with each value of dimension, covered and missing pairs of values
+    for each pair of dimensions and combinations generated more than once
+    """
+
+    def __init__(self):
+        self.tests = {}
+        self.dimensions = defaultdict(Counter)
+        self.pairs = defaultdict(Counter)
+        self.combinations = defaultdict(list)
+
+    def add(self, nodeid, fixture_names, plan):
+        """
+        add combinations of one test
+
+        :param plan: plan of combinations (`FixtureGrouper.get_plan`)
+        """
+        order = sorted(range(len(fixture_names)), key=fixture_names.__getitem__)
+        names = [fixture_names[index] for index in order]
+        fixtures = plan['fixtures']
+        self.tests[nodeid] = len(plan['combinations'])
+        for comb in plan['combinations']:
+            values = tuple(fixtures[comb[index]][len(fixture_names[index]) + 1:] for index in order)
+            for name, value in zip(names, values):
+                self.dimensions[name][value] += 1
+            for first, second in itertools.combinations(range(len(names)), 2):
+                self.pairs[names[first], names[second]][values[first], values[second]] += 1
+            self.combinations[tuple(zip(names, values))].append(nodeid)
+
+    def get_pairs(self):
+        pairs = []
+        for (first, second), counts in sorted(self.pairs.items()):
+            expected = itertools.product(sorted(self.dimensions[first]), sorted(self.dimensions[second]))
+            missing = [list(pair) for pair in expected if pair not in counts]
+            pairs.append({
+                'fixtures': [first, second],
+                'covered': len(counts),
+                'total': len(counts) + len(missing),
+                'missing': missing,
+                'counts': [[first_value, second_value, count]
+                           for (first_value, second_value), count in sorted(counts.items())],
+            })
+        return pairs
+
+    def get_redundant(self):
+        return [{'combination': dict(combination), 'count': len(nodeids), 'tests': sorted(set(nodeids))}
+                for combination, nodeids in sorted(self.combinations.items()) if len(nodeids) > 1]
+
+    def get_data(self):
+        return {
+            'tests': self.tests,
+            'dimensions': {name: dict(sorted(counts.items())) for name, counts in sorted(self.dimensions.items())},
+            'pairs': self.get_pairs(),
+            'redundant': self.get_redundant(),
+        }
+
+    def write(self, path):
+        """
+        write report as html (for .html or .htm path) or json
+        """
+        data = self.get_data()
+        with open(path, 'w') as f:
+            if path.endswith(('.html', '.htm')):
+                f.write(render_html(data))
+            else:
+                json.dump(data, f, indent=2)
+
+
+def render_html(data):
+    escape = html.escape
+    parts = ['<!DOCTYPE html>', '<html><head><meta charset="utf-8"><title>Matrix coverage</title>',
+             '<style>table{border-collapse:collapse;margin-bottom:1em}td,th{border:1px solid #999;padding:2px 6px}'
+             'td.missing{background:#f99}td.redundant{background:#ff9}</style></head><body>',
+             '<h1>Matrix coverage</h1>', '<h2>Tests</h2>', '<table><tr><th>test</th><th>combinations</th></tr>']
+    parts.extend('<tr><td>{}</td><td>{}</td></tr>'.format(escape(nodeid), count)
+                 for nodeid, count in sorted(data['tests'].items()))
+    parts.append('</table><h2>Dimensions</h2>')
+    for name, counts in data['dimensions'].items():
+        parts.append('<table><tr><th>{}</th><th>combinations</th></tr>'.format(escape(name)))
+        parts.extend('<tr><td>{}</td><td>{}</td></tr>'.format(escape(value), count) for value, count in counts.items())
+        parts.append('</table>')
+    parts.append('<h2>Pairs</h2>')
+    for pair in data['pairs']:
+        first, second = pair['fixtures']
+        counts = {(first_value, second_value): count for first_value, second_value, count in pair['counts']}
+        parts.append('<h3>{} / {}: {} of {} pairs</h3>'.format(escape(first), escape(second), pair['covered'],
+                                                               pair['total']))
+        parts.append('<table><tr><th></th>')
+        parts.extend('<th>{}</th>'.format(escape(value)) for value in data['dimensions'][second])
+        parts.append('</tr>')
+        for first_value in data['dimensions'][first]:
+            parts.append('<tr><th>{}</th>'.format(escape(first_value)))
+            for second_value in data['dimensions'][second]:
+                count = counts.get((first_value, second_value), 0)
+                css = 'missing' if not count else ''
+                parts.append('<td class="{}">{}</td>'.format(css, count))
+            parts.append('</tr>')
+        parts.append('</table>')
+    parts.append('<h2>Redundant combinations</h2><table><tr><th>combination</th><th>count</th><th>tests</th></tr>')
+    for redundant in data['redundant']:
+        combination = ', '.join('{}={}'.format(name, value) for name, value in redundant['combination'].items())
+        parts.append('<tr><td class="redundant">{}</td><td>{}</td><td>{}</td></tr>'.format(
+            escape(combination), redundant['count'], '<br>'.join(map(escape, redundant['tests']))))
+    parts.append('</table></body></html>')
+    return '\n'.join(parts)
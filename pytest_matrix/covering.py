@@ -0,0 +1,88 @@
+import itertools
+
+from .ordering import pruned_product
+
+
+def covering_array(radices, strength):
+    """
+    build covering array of given strength (IPOG algorithm)
+
+    every combination of values of any `strength` columns is present at least in one row
+
+    radices = [2, 2, 2]
+    strength = 2
+
+    :return: [(0, 0, 0),
+              (0, 1, 1),
+              (1, 0, 1),
+              (1, 1, 0),
+              ]
+    """
+    radices = list(radices)
+    if not radices or not all(radices):
+        return []
+    if strength >= len(radices):
+        return list(itertools.product(*(range(radix) for radix in radices)))
+
+    rows = [list(row) for row in itertools.product(*(range(radix) for radix in radices[:strength]))]
+    for column in range(strength, len(radices)):
+        uncovered = {cols: set(itertools.product(*(range(radices[c]) for c in cols + (column,))))
+                     for cols in itertools.combinations(range(column), strength - 1)}
+        extend_horizontally(rows, column, radices[column], uncovered)
+        extend_vertically(rows, column, uncovered)
+
+    return [tuple(0 if value is None else value for value in row) for row in rows]
+
+
+def extend_horizontally(rows, column, radix, uncovered):
+    for row in rows:
+        value = max(range(radix), key=lambda v: (covered_count(row, v, uncovered), -v))
+        row.append(value)
+        for cols, tuples in uncovered.items():
+            tuples.discard(tuple(row[c] for c in cols) + (value,))
+
+
+def covered_count(row, value, uncovered):
+    return sum((tuple(row[c] for c in cols) + (value,)) in tuples for cols, tuples in uncovered.items())
+
+
+def extend_vertically(rows, column, uncovered):
+    for cols, tuples in uncovered.items():
+        cols = cols + (column,)
+        for values in sorted(tuples):
+            for row in rows:
+                if all(row[c] is None or row[c] == v for c, v in zip(cols, values)):
+                    break
+            else:
+                row = [None] * (column + 1)
+                rows.append(row)
+            for c, v in zip(cols, values):
+                row[c] = v
+
+
+def constrained_covering_array(radices, strength, checks):
+    """
+    covering array without rows failing checks, every combination of `strength` columns which is part
+    of any valid row is present
+
+    invalid rows of IPOG covering array are removed and missing combinations are added as first valid row
+    containing them
+
+    :param checks: list of functions for each column, function gets row with columns set up to the column
+    """
+    permutation = list(range(len(radices)))
+    rows = [row for row in covering_array(radices, strength)
+            if all(check(row) for depth_checks in checks for check in depth_checks)]
+    covered = {cols: {tuple(row[c] for c in cols) for row in rows}
+               for cols in itertools.combinations(range(len(radices)), strength)}
+    for cols, tuples in covered.items():
+        for values in itertools.product(*(range(radices[c]) for c in cols)):
+            if values in tuples:
+                continue
+            row = next(pruned_product(radices, permutation, checks=checks, fixed=dict(zip(cols, values))), None)
+            if row is None:
+                continue
+            rows.append(row)
+            for other_cols, other_tuples in covered.items():
+                other_tuples.add(tuple(row[c] for c in other_cols))
+    return rows
@@ -1,9 +1,16 @@
 
 
+import pytest
+
+
 class PytestMatrixException(Exception):
     pass
 
 
+class MatrixBudgetWarning(pytest.PytestWarning):
+    pass
+
+
 class FixturesCombinationsMissing(PytestMatrixException):
     def __init__(self, class_name, function_name):
         from .mixin import MatrixTestBase
@@ -28,3 +35,25 @@ class InvalidFixturesCombinationsKeys(PytestMatrixException):
             msg += "Missing: " + missing
 
         super().__init__(msg.format_map(vars()))
+
+
+class InvalidGrouperOption(PytestMatrixException):
+
+    def __init__(self, option, reason):
+        msg = "Invalid matrix option '{option}': {reason}"
+        super().__init__(msg.format_map(vars()))
+
+
+class InvalidFixturesOption(PytestMatrixException):
+
+    def __init__(self, class_name, function_name, error):
+        from .mixin import MatrixTestBase
+        function_name = function_name.upper()
+        msg = "In testing class '{class_name}' in {function_name}{MatrixTestBase.FIXTURE_SUFFIX}: {error}"
+        super().__init__(msg.format_map(vars()))
+
+
+class MatrixBudgetExceeded(PytestMatrixException):
+
+    def __init__(self, msg):
+        super().__init__(msg)
@@ -0,0 +1,94 @@
+import json
+import os
+
+from _pytest.fixtures import FixtureRequest
+from _pytest.reports import TestReport
+from _pytest.runner import TEST_OUTCOME, runtestprotocol
+from pytest_lazyfixture import is_lazy_fixture
+
+from pytest_matrix.concurrency import get_fixture_closure
+
+
+def is_fork_supported():
+    return hasattr(os, 'fork')
+
+
+def get_shared_fixtures(item):
+    """
+    :return: names of fixtures of the item with higher scope than function including fixtures, which values
+        of matrix fixtures (lazy fixtures bound by `bind_fixturedefs`) depend on
+    """
+    params = getattr(item, 'callspec', None)
+    params = params.params if params is not None else {}
+    request = item._request
+    roots = [name for name in item.fixturenames if name not in params]
+    roots.extend(value.name for value in params.values() if is_lazy_fixture(value))
+    closure = set(roots)
+    for name in roots:
+        closure.update(get_fixture_closure(request, name))
+    names = []
+    for name in sorted(closure.difference(params)):
+        fixturedefs = request._arg2fixturedefs.get(name)
+        if fixturedefs and fixturedefs[-1].scope != 'function':
+            names.append(name)
+    return names
+
+
+def warm_up(item):
+    """
+    set up collectors of the item (class, module) and its shared fixtures in parent process, so forked children
+    reuse them, errors (also skip or fail of a fixture) are raised again by the child, fixtures are requested
+    by a new request, so state of the item's request is not changed by the error
+    """
+    try:
+        item.session._setupstate.prepare(item.parent)
+        request = FixtureRequest(item)
+        for name in get_shared_fixtures(item):
+            request.getfixturevalue(name)
+    except TEST_OUTCOME:
+        pass
+
+
+def run_forked(item, nextitem):
+    """
+    run test protocol of the item in forked process, child sets up fixtures of the item (shared fixtures are
+    inherited from parent), runs the test and tears down only the item, reports are sent back to parent
+    through pipe
+
+    :return: reports of the item
+    """
+    warm_up(item)
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        exit_code = 0
+        try:
+            with os.fdopen(write_fd, 'w') as pipe:
+                for report in runtestprotocol(item, log=False, nextitem=item.parent):
+                    data = item.config.hook.pytest_report_to_serializable(config=item.config, report=report)
+                    pipe.write(json.dumps(data) + '\n')
+        except BaseException:
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        lines = pipe.readlines()
+    _, status = os.waitpid(pid, 0)
+    reports = [item.config.hook.pytest_report_from_serializable(config=item.config, data=json.loads(line))
+               for line in lines]
+    if not reports or reports[-1].when != 'teardown':
+        reports.append(get_crash_report(item, status))
+    item.session._setupstate.teardown_exact(item, nextitem)
+    return reports
+
+
+def get_crash_report(item, status):
+    if os.WIFSIGNALED(status):
+        reason = "signal {}".format(os.WTERMSIG(status))
+    else:
+        reason = "exit code {}".format(os.WEXITSTATUS(status))
+    return TestReport(item.nodeid, item.location, {name: 1 for name in item.keywords}, 'failed',
+                      "forked test process crashed with {}".format(reason), 'call')
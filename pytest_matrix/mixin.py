@@ -1,12 +1,22 @@
 import re
-from collections import defaultdict, Iterable
+from collections import defaultdict
 from functools import reduce
 
+import hashlib
 import itertools
+import json
+import operator
+import sys
 
 import pytest
+from pytest_lazyfixture import is_lazy_fixture
 
 from . import exceptions
+from .constraints import Constraints, get_depth_checks
+from .covering import constrained_covering_array, covering_array
+from .ordering import get_costs_permutation, get_order_key, ordered_product, pruned_product
+from .profiling import profiler
+from .sampling import BoxSpace, ListSpace, get_sample_size, sample
 
 
 class MatrixTestBase(type):
@@ -25,35 +35,71 @@ class MatrixTestBase(type):
         dct.setdefault('NOT_GENERATE_TESTS', [])
         dct.setdefault('COMBINATIONS_COVER', [])
         dct.setdefault('COMBINATIONS_COVER_TESTS', [])
-        new_cls = super().__new__(mcs, name, bases, dct)
-        is_test_case = not new_cls.IS_MIXIN
-        if is_test_case:
-            test_names = new_cls.get_cleaned_test_names()
-            all_groupers = {}
-            for test_name in test_names:
-                try:
-                    fixture_combinations = MatrixTestBase.get_raw_fixtures_data(dct, test_name)
-                except KeyError:
-                    raise exceptions.FixturesCombinationsMissing(name, test_name)
-                try:
-                    fixture_names = MatrixTestBase.get_fixtures_names(dct, test_name)
-                except KeyError:
-                    fixture_names = extract_fixture_names(fixture_combinations)
-                    setattr(new_cls, test_name.upper() + MatrixTestBase.FIXTURE_NAMES_SUFFIX, fixture_names)
-                MatrixTestBase.validate_fixture_combinations(name, test_name, fixture_names, fixture_combinations)
-                all_groupers[test_name] = fixture_combinations
-            new_cls.set_combinations_method(all_groupers)
+        class_path = dct.get('__module__', '') + '.' + dct.get('__qualname__', name)
+        with profiler.measure('class', class_path):
+            new_cls = super().__new__(mcs, name, bases, dct)
+            new_cls._matrix_test_names = MatrixTestBase.index_test_names(bases, dct)
+            new_cls._matrix_skip_tests = frozenset(new_cls.SKIP_TESTS)
+            new_cls._matrix_not_generate_tests = frozenset(new_cls.NOT_GENERATE_TESTS)
+            new_cls._matrix_configs = {}
+            is_test_case = not new_cls.IS_MIXIN
+            if is_test_case:
+                test_names = new_cls.get_cleaned_test_names()
+                all_groupers = {}
+                for test_name in test_names:
+                    try:
+                        fixture_combinations = MatrixTestBase.get_raw_fixtures_data(dct, test_name)
+                    except KeyError:
+                        raise exceptions.FixturesCombinationsMissing(name, test_name)
+                    try:
+                        fixture_names = MatrixTestBase.get_fixtures_names(dct, test_name)
+                    except KeyError:
+                        fixture_names = extract_fixture_names(fixture_combinations)
+                        setattr(new_cls, test_name.upper() + MatrixTestBase.FIXTURE_NAMES_SUFFIX, fixture_names)
+                    MatrixTestBase.validate_fixture_combinations(name, test_name, fixture_names, fixture_combinations)
+                    grouper_options = MatrixTestBase.get_grouper_options(dct, test_name)
+                    MatrixTestBase.validate_grouper_options(name, test_name, grouper_options, fixture_names)
+                    all_groupers[test_name] = fixture_combinations
+                    new_cls._matrix_configs[test_name] = fixture_names, fixture_combinations, grouper_options
+                with profiler.measure('combocover', class_path):
+                    new_cls.set_combinations_method(all_groupers)
 
         return new_cls
 
+    @staticmethod
+    def index_test_names(bases, dct):
+        """
+        :return: names of all test functions of the class, names of MatrixTestBase bases are taken from their index
+            (generated combocover tests are not included)
+        """
+        prefix = MatrixTestBase.TEST_FUNCTION_PREFIX
+        test_names = set()
+        for base in bases:
+            if isinstance(base, MatrixTestBase):
+                test_names.update(base._matrix_test_names)
+            else:
+                test_names.update(att for att in dir(base) if att.startswith(prefix))
+        test_names.update(att for att, value in dct.items()
+                          if att.startswith(prefix) and not getattr(value, '_combocover', False))
+        return frozenset(test_names)
+
     def get_cleaned_test_names(cls):
         """
         :return: list of test's names, and include only tests wich are not in SKIP_TESTS or NOT_GENERATE_TESTS
         """
         prefix_len = len(cls.TEST_FUNCTION_PREFIX)
-        test_names = (att for att in dir(cls) if att.startswith(cls.TEST_FUNCTION_PREFIX))
-        skip_tests = (att for att in test_names if cls.should_be_parametrize(att))
-        return [att[prefix_len:] for att in skip_tests]
+        return [att[prefix_len:] for att in sorted(cls._matrix_test_names) if cls.should_be_parametrize(att)]
+
+    def get_matrix_config(cls, function_name):
+        """
+        :return: (fixture_names, fixture_combinations, grouper_options) of test function (without prefix)
+        """
+        try:
+            return cls._matrix_configs[function_name]
+        except KeyError:
+            return (MatrixTestBase.get_fixtures_names(cls.__dict__, function_name),
+                    MatrixTestBase.get_raw_fixtures_data(cls.__dict__, function_name),
+                    MatrixTestBase.get_grouper_options(cls.__dict__, function_name))
 
     def set_combinations_method(cls, all_groupers):
         all_fixtures = defaultdict(set)
@@ -76,7 +122,14 @@ class MatrixTestBase(type):
 
                 all_combs_grouper = FixtureGrouper(fixture_names, [group_expected])
 
-                difference = sorted(all_combs_grouper.difference(selected_groups))
+                configs = [cls.get_matrix_config(name) for name in test_functions]
+                if any(FixtureGrouper.get_selection_options(options) for _, _, options in configs):
+                    difference = all_combs_grouper.difference_generated(
+                        FixtureGrouper(names, combinations, **FixtureGrouper.get_selection_options(options))
+                        for names, combinations, options in configs)
+                else:
+                    difference = all_combs_grouper.difference(selected_groups)
+                difference = sorted(difference)
                 assert not any(difference), "Missing combinations:\n" + '\n'.join(difference)
             test_combocover.__name__ = test_name
             test_combocover._combocover = True
@@ -86,6 +139,7 @@ class MatrixTestBase(type):
             f_names = comb_conf['fixture_names']
             t_functions = comb_conf['fixture_functions']
             test_scope = comb_conf.get('scope', cls.CLASS_SCOPE)
+            cls.validate_cover_options(t_functions)
 
             test_name = "test_combocover_{test_functions}_{fixture_names}".format(
                 test_functions="_".join(t_functions),
@@ -95,6 +149,18 @@ class MatrixTestBase(type):
             setattr(cls, test_name, wrapper(f_names, t_functions, test_scope, test_name))
             cls.COMBINATIONS_COVER_TESTS.append(test_name)
 
+    def validate_cover_options(cls, test_functions):
+        """
+        functions checked by one combocover test have to generate combinations with same options
+        """
+        options = [FixtureGrouper.get_selection_options(cls._matrix_configs[name][2])
+                   for name in test_functions if name in cls._matrix_configs]
+        if any(function_options != options[0] for function_options in options[1:]):
+            raise exceptions.InvalidGrouperOption(
+                ', '.join(sorted(set().union(*options))),
+                "functions {} of COMBINATIONS_COVER generate combinations with different options".format(
+                    ', '.join(test_functions)))
+
     @staticmethod
     def get_fixtures_names(dct, function_name):
         name = function_name.upper() + TestMatrixMixin.FIXTURE_NAMES_SUFFIX
@@ -107,10 +173,16 @@ class MatrixTestBase(type):
         values = dct[name]
         return values
 
+    @staticmethod
+    def get_grouper_options(dct, function_name):
+        prefix = function_name.upper() + TestMatrixMixin.FIXTURE_SUFFIX + '_'
+        return {option: dct[prefix + option.upper()] for option in FixtureGrouper.OPTIONS
+                if prefix + option.upper() in dct}
+
     def should_be_parametrize(cls, function_name):
-        if function_name in cls.SKIP_TESTS:
+        if function_name in cls._matrix_skip_tests:
             return False
-        if function_name in cls.NOT_GENERATE_TESTS:
+        if function_name in cls._matrix_not_generate_tests:
             return False
         if function_name.startswith('test_combocover'):
             if getattr(getattr(cls, function_name), '_combocover', False):
@@ -126,6 +198,13 @@ class MatrixTestBase(type):
                 raise exceptions.InvalidFixturesCombinationsKeys(class_name, test_name,
                                                                  fixture_names, extra, missing)
 
+    @staticmethod
+    def validate_grouper_options(class_name, test_name, options, fixture_names=None):
+        try:
+            FixtureGrouper.validate_options(options, fixture_names)
+        except exceptions.InvalidGrouperOption as e:
+            raise exceptions.InvalidFixturesOption(class_name, test_name, e)
+
 
 class TestMatrixMixin(metaclass=MatrixTestBase):
     """
@@ -170,75 +249,458 @@ class TestMatrixMixin(metaclass=MatrixTestBase):
 
 class FixtureGrouper(list):
 
+    PRODUCT_STRATEGY = 'product'
+    PAIRWISE_STRATEGY = 'pairwise'
+    NWISE_STRATEGY = 'nwise'
+    STRATEGIES = (PRODUCT_STRATEGY, PAIRWISE_STRATEGY, NWISE_STRATEGY)
+
+    PRODUCT_ORDER = 'product'
+    GRAY_ORDER = 'gray'
+    ORDERS = (PRODUCT_ORDER, GRAY_ORDER)
+
+    OPTIONS = ('strategy', 'strength', 'order', 'costs', 'dedupe', 'cache', 'concurrent', 'batch') + Constraints.OPTIONS
+    SELECTION_OPTIONS = ('strategy', 'strength') + Constraints.OPTIONS
+
+    PLAN_VERSION = 3
+
+    ID_SEPARATOR = '|'
+
     SIMPLE_FIXTURE_MAPPER = {
         '#': int,
         '@': str,
     }
     SIMPLE_FIXTURE_REGEX = re.compile('.+_([#@])(.+)'.format(vars=''.join(SIMPLE_FIXTURE_MAPPER.keys())))
 
-    def __init__(self, fixture_names, *args, **kwargs):
+    def __init__(self, fixture_names, *args, **options):
         if not (isinstance(fixture_names, list), isinstance(fixture_names, tuple)):
             raise TypeError("fixture_names must be instance of 'list' or 'tuple', not: "
                             "'{fixture_names.__class__.__name__}'".format_map(vars()))
+        self.validate_options(options, fixture_names)
         self._fixture_names = fixture_names
-        super().__init__(*args, **kwargs)
+        self._options = options
+        self._constraints = Constraints(options.get('exclude'), options.get('require'))
+        self._symbols = []
+        self._symbol_indexes = {}
+        super().__init__(*args)
 
     @property
     def fixture_names(self):
         return self._fixture_names
 
+    @property
+    def options(self):
+        return self._options
+
+    @property
+    def constraints(self):
+        return self._constraints
+
+    @property
+    def strength(self):
+        """
+        :return: strength of covering array or None for full cartesian product
+        """
+        strategy = self.options.get('strategy', self.PRODUCT_STRATEGY)
+        if strategy == self.PAIRWISE_STRATEGY:
+            return 2
+        if strategy == self.NWISE_STRATEGY or 'strength' in self.options:
+            return self.options.get('strength', 2)
+        return None
+
+    @classmethod
+    def validate_options(cls, options, fixture_names=None):
+        unknown = set(options).difference(cls.OPTIONS)
+        if unknown:
+            raise exceptions.InvalidGrouperOption(', '.join(sorted(unknown)), 'unknown option')
+        strategy = options.get('strategy', cls.PRODUCT_STRATEGY)
+        if strategy not in cls.STRATEGIES:
+            raise exceptions.InvalidGrouperOption('strategy', "must be one of: " + ', '.join(cls.STRATEGIES))
+        strength = options.get('strength')
+        if strength is not None and (not isinstance(strength, int) or strength < 1):
+            raise exceptions.InvalidGrouperOption('strength', 'must be positive integer')
+        if strategy == cls.PAIRWISE_STRATEGY and strength not in (None, 2):
+            raise exceptions.InvalidGrouperOption('strength', "strategy 'pairwise' has always strength 2")
+        if strategy == cls.PRODUCT_STRATEGY and strength is not None and 'strategy' in options:
+            raise exceptions.InvalidGrouperOption('strength', "strategy 'product' does not accept strength")
+        if options.get('order', cls.PRODUCT_ORDER) not in cls.ORDERS:
+            raise exceptions.InvalidGrouperOption('order', "must be one of: " + ', '.join(cls.ORDERS))
+        costs = options.get('costs', {})
+        if not isinstance(costs, dict) or not all(isinstance(cost, (int, float)) for cost in costs.values()):
+            raise exceptions.InvalidGrouperOption('costs', "must be dict of fixture name and number")
+        if not isinstance(options.get('dedupe', True), bool):
+            raise exceptions.InvalidGrouperOption('dedupe', "must be True or False")
+        cache = options.get('cache', {})
+        if not isinstance(cache, dict) or not all(size is None or isinstance(size, int) and size > 0
+                                                  for size in cache.values()):
+            raise exceptions.InvalidGrouperOption('cache', "must be dict of fixture name and maximal number "
+                                                           "of cached values (or None)")
+        if fixture_names is not None and set(cache).difference(fixture_names):
+            raise exceptions.InvalidGrouperOption('cache', "unknown fixture names: " +
+                                                  ', '.join(sorted(set(cache).difference(fixture_names))))
+        concurrent = options.get('concurrent', False)
+        if not isinstance(concurrent, int) or concurrent < 0:
+            raise exceptions.InvalidGrouperOption('concurrent', "must be True, False or number of threads")
+        batch = options.get('batch', False)
+        if not isinstance(batch, int) or batch < 0:
+            raise exceptions.InvalidGrouperOption('batch', "must be True, False or number of combinations "
+                                                           "of one test item")
+        for option in Constraints.OPTIONS:
+            if option in options:
+                Constraints.validate(option, options[option], fixture_names)
+
     def __getitem__(self, item):
-        return generate_single_group_name_combinations(super().__getitem__(item), self.fixture_names)
+        return self.generate_group_combinations(super().__getitem__(item), self.fixture_names)
+
+    def generate_group_combinations(self, group, fixture_names):
+        return generate_single_group_name_combinations(group, fixture_names, self.strength,
+                                                       self.options.get('order'), self.options.get('costs'),
+                                                       self.constraints)
 
     def __delitem__(self, key):
         raise NotImplementedError()
 
-    def generate_fixtures_with_ids(self, fixture_names=None):
+    def generate_combinations(self, fixture_names=None):
         fixture_names = fixture_names or self.fixture_names
-        fixture_combs = itertools.chain(*(generate_single_group_name_combinations(g, fixture_names)
-                                          for g in super().__iter__()))
-        for comb in fixture_combs:
-            ids, fixtures = zip(*map(self.create_fixture_for_name, comb))
-            ids = "|".join(sorted(ids))
-            yield ids, fixtures
+        return itertools.chain(*(self.generate_group_combinations(g, fixture_names)
+                                 for g in super().__iter__()))
+
+    def get_symbol(self, name):
+        """
+        :return: index of fixture name in symbol table, the name is parsed and its id and fixture
+            are created only once
+        """
+        try:
+            return self._symbol_indexes[name]
+        except KeyError:
+            index = self._symbol_indexes[name] = len(self._symbols)
+            self._symbols.append(self.create_fixture_for_name(name))
+            return index
+
+    def get_lazy_fixture_names(self):
+        """
+        :return: names of lazy fixtures in symbol table (only fixtures of already generated combinations)
+        """
+        return [fixture.name for _, fixture in self._symbols if is_lazy_fixture(fixture)]
+
+    def get_lazy_value_names(self, fixture_name):
+        """
+        :return: names of lazy fixtures, which are values of fixture_name
+        """
+        names = ("%s_%s" % (fixture_name, item) for item in self.get_fixture_types(fixture_name))
+        return sorted(name for name in names if not self.SIMPLE_FIXTURE_REGEX.match(name))
+
+    def get_group_symbols(self, group, fixture_names):
+        return [[self.get_symbol("%s_%s" % (name, item)) for item in group[name]] for name in fixture_names]
+
+    @property
+    def dedupe(self):
+        return self.options.get('dedupe', True)
+
+    def generate_symbol_combinations(self, fixture_names=None):
+        """
+        generate combinations as tuples of indexes to symbol table, combinations already generated
+        by previous group are skipped (unless option dedupe is False)
+        """
+        fixture_names = fixture_names or self.fixture_names
+        groups = [self.get_group_symbols(g, fixture_names) for g in super().__iter__()]
+        combinations = [generate_single_group_combinations(group, fixture_names, self.strength,
+                                                           self.options.get('order'), self.options.get('costs'),
+                                                           self.get_group_rules(g, fixture_names))
+                        for g, group in zip(super().__iter__(), groups)]
+        if self.dedupe and len(groups) > 1:
+            return self.dedupe_combinations(groups, combinations)
+        return itertools.chain(*combinations)
+
+    def get_group_rules(self, group, fixture_names):
+        """
+        :return: constraints of group as rules for rows of value indexes or None without constraints
+        """
+        if not self.constraints:
+            return None
+        return self.constraints.get_row_rules(fixture_names, [group[name] for name in fixture_names])
+
+    def dedupe_combinations(self, groups, combinations):
+        """
+        skip combinations generated by previous groups, only combinations of groups overlapping with another
+        group are remembered, each one encoded as single int (symbols are digits in base of symbol table length)
+
+        :param groups: symbols of each fixture name for each group
+        :param combinations: iterables of symbol combinations for each group
+        """
+        overlaps = get_overlaps([[set(symbols) for symbols in group] for group in groups])
+        base = len(self._symbols)
+        seen = set()
+        for index, group_combinations in enumerate(combinations):
+            check = any(overlaps[index][:index])
+            remember = any(overlaps[index][index + 1:])
+            if not check and not remember:
+                yield from group_combinations
+                continue
+            for comb in group_combinations:
+                key = reduce(lambda key, symbol: key * base + symbol, comb, 0)
+                if check and key in seen:
+                    continue
+                if remember:
+                    seen.add(key)
+                yield comb
+
+    def get_id_order(self, fixture_names=None):
+        """
+        ids in generated combination are sorted, but usually the order is same for all combinations
+
+        :return: indexes of fixture_names in order of ids in every combination or None
+            when ids of different fixtures can be mixed
+        """
+        fixture_names = fixture_names or self.fixture_names
+        bounds = [None] * len(fixture_names)
+        for group in super().__iter__():
+            for index, symbols in enumerate(self.get_group_symbols(group, fixture_names)):
+                ids = [self._symbols[symbol][0] for symbol in symbols]
+                if not ids:
+                    continue
+                if bounds[index] is not None:
+                    ids.extend(bounds[index])
+                bounds[index] = (min(ids), max(ids))
+        order = sorted((bound for bound in enumerate(bounds) if bound[1] is not None), key=lambda bound: bound[1])
+        if any(previous[1] >= following[0] for (_, previous), (_, following) in zip(order, order[1:])):
+            return None
+        return [index for index, _ in order]
+
+    def generate_fixtures_with_ids(self, fixture_names=None):
+        id_order = self.get_id_order(fixture_names)
+        symbols = self._symbols
+        separator = self.ID_SEPARATOR
+        for comb in self.generate_symbol_combinations(fixture_names):
+            if id_order is None:
+                ids = separator.join(sorted(symbols[symbol][0] for symbol in comb))
+            else:
+                ids = separator.join([symbols[comb[index]][0] for index in id_order])
+            yield ids, tuple(symbols[symbol][1] for symbol in comb)
+
+    def get_plan_key(self):
+        """
+        :return: stable hash of fixture names, combinations and options or None if they are not serializable
+        """
+        try:
+            data = json.dumps([self.PLAN_VERSION, self.fixture_names, list(super().__iter__()), self.options],
+                              sort_keys=True)
+        except TypeError:
+            return None
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    def get_plan(self, combinations=None):
+        """
+        compile combinations to json serializable plan
+
+        :param combinations: symbol combinations, all generated combinations by default
+        :return: {'fixtures': ['a_x', 'a_y', 'b_z'],
+                  'combinations': [[0, 2], [1, 2]],
+                  'ids': ['a_x|b_z', 'a_y|b_z'],
+                  }
+        """
+        if combinations is None:
+            combinations = self.generate_symbol_combinations()
+        combinations = list(map(list, combinations))
+        id_order = self.get_id_order()
+        symbols = self._symbols
+        if id_order is None:
+            ids = [self.ID_SEPARATOR.join(sorted(symbols[symbol][0] for symbol in comb)) for comb in combinations]
+        else:
+            ids = [self.ID_SEPARATOR.join([symbols[comb[index]][0] for index in id_order]) for comb in combinations]
+        fixtures = sorted(self._symbol_indexes, key=self._symbol_indexes.get)
+        return {'fixtures': fixtures, 'combinations': combinations, 'ids': ids}
+
+    def get_sample_plan(self, size, rng):
+        """
+        plan of random sample of combinations, every fixture value is present at least once
+
+        cartesian product is sampled from index space of its (disjoint) groups without generating it,
+        covering arrays and constrained combinations are generated first
+
+        :param size: number of combinations or fraction of all combinations
+        :param rng: random.Random
+        """
+        if self.strength is None and not self.constraints:
+            boxes = [self.get_group_symbols(group, self.fixture_names) for group in super().__iter__()]
+            if self.dedupe:
+                masks = [tuple(reduce(operator.or_, (1 << symbol for symbol in symbols), 0) for symbols in box)
+                         for box in boxes]
+                boxes = [[list(iter_bits(mask)) for mask in box] for box in get_disjoint_boxes(masks)]
+            space = BoxSpace(boxes)
+        else:
+            space = ListSpace(list(self.generate_symbol_combinations()))
+        indexes = sample(space, get_sample_size(size, space.total), rng)
+        return self.get_plan(space.get_row(index) for index in indexes)
+
+    @classmethod
+    def split_ids(cls, nodeid):
+        """
+        :return: fixture ids of generated test
+
+        split_ids('test_file.py::TestCase::test_fn[a_x|b_y]') == ('a_x', 'b_y')
+        """
+        name = nodeid.rsplit('::', 1)[-1]
+        start = name.find('[')
+        if start == -1 or not name.endswith(']'):
+            return ()
+        return tuple(name[start + 1:-1].split(cls.ID_SEPARATOR))
+
+    def get_fixture_ids(self, params):
+        """
+        :param params: callspec params of generated test
+        :return: [(fixture name, id), ...] of fixtures of generated test
+        """
+        fixture_ids = []
+        for name in self.fixture_names:
+            value = params.get(name)
+            for item in self.get_fixture_types(name):
+                fixture_id, fixture = self._symbols[self.get_symbol("%s_%s" % (name, item))]
+                if fixture is value or (type(fixture) is type(value) and fixture == value):
+                    fixture_ids.append((name, fixture_id))
+                    break
+        return fixture_ids
 
     def create_fixture_for_name(self, name):
         simple_fixture = self.SIMPLE_FIXTURE_REGEX.match(name)
         if simple_fixture:
-            code, name = simple_fixture.groups()
-            return name, self.SIMPLE_FIXTURE_MAPPER[code](name)
+            code, value = simple_fixture.groups()
+            return sys.intern(value), self.SIMPLE_FIXTURE_MAPPER[code](value)
         else:
-            return name, pytest.lazy_fixture(name)
+            return sys.intern(name), pytest.lazy_fixture(name)
 
     def __add__(self, other):
-        return FixtureGrouper(self.fixture_names, super().__add__(other))
+        return FixtureGrouper(self.fixture_names, super().__add__(other), **self.options)
 
     def get_fixture_types(self, fixture_name, with_fixture_name=False):
         return set(itertools.chain(*(conf[fixture_name] for conf in super().__iter__())))
 
+    def count(self):
+        """
+        :return: number of generated combinations, computed from lengths of fixture types in each group
+            (covering arrays are built only from the lengths, without fixture names),
+            with constraints the combinations have to be generated
+        """
+        if self.constraints:
+            return sum(1 for _ in self.generate_symbol_combinations())
+        if self.dedupe and len(self) > 1:
+            sets = [[set(group[name]) for name in self.fixture_names] for group in super().__iter__()]
+            if any(itertools.chain(*get_overlaps(sets))):
+                if self.strength is not None:
+                    return sum(1 for _ in self.generate_symbol_combinations())
+                return self.count_union()
+        lengths = ([len(group[name]) for name in self.fixture_names] for group in super().__iter__())
+        if self.strength is None:
+            return sum(reduce(operator.mul, group_lengths, 1) for group_lengths in lengths)
+        return sum(len(covering_array(group_lengths, self.strength)) for group_lengths in lengths)
+
+    def count_union(self):
+        """
+        :return: number of distinct combinations of all groups, groups are subtracted as boxes
+            (values in each group are expected to be unique)
+        """
+        indexes = [{item: index for index, item in enumerate(self.get_fixture_types(name))}
+                   for name in self.fixture_names]
+        return sum(reduce(operator.mul, (bin(mask).count('1') for mask in box), 1)
+                   for box in get_disjoint_boxes(self.get_boxes(indexes)))
+
+    def create_id_for_name(self, name):
+        simple_fixture = self.SIMPLE_FIXTURE_REGEX.match(name)
+        if simple_fixture:
+            return simple_fixture.group(2)
+        return name
+
+    def get_boxes(self, values):
+        """
+        encode each group as box - tuple of bitmasks (one for each fixture name)
+
+        :param values: list of {fixture_type: bit index} for each fixture name
+        """
+        return [tuple(reduce(operator.or_, (1 << values[index][item] for item in group[name]), 0)
+                      for index, name in enumerate(self.fixture_names))
+                for group in super().__iter__()]
+
     def difference(self, other_fixture_grouper):
         assert other_fixture_grouper.fixture_names == self.fixture_names
-        other_combs = set("[" + ids + "]" for ids, _ in other_fixture_grouper.generate_fixtures_with_ids())
-        self_combs = set("[" + ids + "]" for ids, _ in self.generate_fixtures_with_ids())
-        return self_combs.difference(other_combs)
+        if (self.strength is not None or other_fixture_grouper.strength is not None
+                or self.constraints or other_fixture_grouper.constraints):
+            other_combs = set("[" + ids + "]" for ids, _ in other_fixture_grouper.generate_fixtures_with_ids())
+            self_combs = set("[" + ids + "]" for ids, _ in self.generate_fixtures_with_ids())
+            return self_combs.difference(other_combs)
+
+        values = [sorted(self.get_fixture_types(name) | other_fixture_grouper.get_fixture_types(name))
+                  for name in self.fixture_names]
+        indexes = [{item: index for index, item in enumerate(items)} for items in values]
+        missing = self.get_boxes(indexes)
+        for other_box in other_fixture_grouper.get_boxes(indexes):
+            missing = [box for missing_box in missing for box in subtract_box(missing_box, other_box)]
+
+        ids = [["%s_%s" % (name, item) for item in items] for name, items in zip(self.fixture_names, values)]
+        ids = [[self.create_id_for_name(fixture) for fixture in fixtures] for fixtures in ids]
+        return set("[" + self.ID_SEPARATOR.join(sorted(comb)) + "]"
+                   for box in missing
+                   for comb in itertools.product(*(
+                       [dim_ids[index] for index in iter_bits(mask)] for dim_ids, mask in zip(ids, box))))
+
+    def difference_generated(self, groupers):
+        """
+        combinations of self missing in combinations generated by groupers (with their fixture names and options),
+        combinations of groupers are projected to fixture names of self
+        """
+        covered = set()
+        for grouper in groupers:
+            indexes = [grouper.fixture_names.index(name) for name in self.fixture_names]
+            for comb in grouper.generate_combinations():
+                covered.add(tuple(sorted(self.create_id_for_name(comb[index]) for index in indexes)))
+        return set("[" + self.ID_SEPARATOR.join(comb) + "]"
+                   for comb in (tuple(sorted(self.create_id_for_name(name) for name in names))
+                                for names in self.generate_combinations())
+                   if comb not in covered)
+
+    @classmethod
+    def get_selection_options(cls, options):
+        """
+        :return: options changing which combinations are generated
+        """
+        return {option: value for option, value in options.items() if option in cls.SELECTION_OPTIONS}
 
-    def get_parametrize_data(self, real_fixture_names):
+    def get_parametrize_data(self, real_fixture_names, plan=None):
         grouper_fixture_names = set(self.fixture_names)
         all_fixture_names = set(real_fixture_names).union(grouper_fixture_names)
         extra = grouper_fixture_names.difference(all_fixture_names) or False
-        ids, fixtures = zip(*self.generate_fixtures_with_ids())
         return {
             'argnames': self.fixture_names,
-            'argvalues': fixtures,
-            'ids': ids,
+            'argvalues': self.generate_parameter_sets(plan),
             'indirect': extra
         }
 
+    def generate_parameter_sets(self, plan=None):
+        """
+        generate pytest.param for each combination lazily, so ids and values are not collected
+        into separate tuples before parametrization
+
+        :param plan: compiled plan from `get_plan`, combinations are not generated again
+        """
+        if plan is None:
+            for ids, fixtures in self.generate_fixtures_with_ids():
+                yield pytest.param(*fixtures, id=ids)
+        else:
+            fixtures = [self._symbols[self.get_symbol(name)][1] for name in plan['fixtures']]
+            for comb, ids in zip(plan['combinations'], plan['ids']):
+                yield pytest.param(*(fixtures[symbol] for symbol in comb), id=ids)
 
-def generate_single_group_name_combinations(group, fixture_names):
+
+def generate_single_group_name_combinations(group, fixture_names, strength=None, order=None, costs=None,
+                                            constraints=None):
     """
     generate combinations of group ordered by fixture_names
 
+    with strength it generates only covering array, where every combination of `strength` fixtures is present
+
+    the most expensive fixtures (by costs) are changed least often, gray order changes only one fixture
+    between two following combinations
+
+    combinations excluded by constraints are pruned while they are generated
+
     self.names = ['a', 'b']
     group = {'b': ["A", "B", "C"],
              'a': ["x", "y"]
@@ -252,9 +714,94 @@ def generate_single_group_name_combinations(group, fixture_names):
               ('a_y', 'y_C'),
               )
     """
-    ordered_groups = (tuple("%s_%s" % (name, item) for item in group[name])
-                      for name in fixture_names)
-    return itertools.product(*ordered_groups)
+    ordered_groups = [tuple("%s_%s" % (name, item) for item in group[name])
+                      for name in fixture_names]
+    rules = None
+    if constraints:
+        rules = constraints.get_row_rules(fixture_names, [group[name] for name in fixture_names])
+    return generate_single_group_combinations(ordered_groups, fixture_names, strength, order, costs, rules)
+
+
+def generate_single_group_combinations(ordered_groups, fixture_names, strength=None, order=None, costs=None,
+                                       rules=None):
+    """
+    same as `generate_single_group_name_combinations` for any items (list of items for each fixture name)
+
+    :param rules: constraints as rules for rows of item indexes (`Constraints.get_row_rules`)
+    """
+    radices = [len(items) for items in ordered_groups]
+    permutation = get_costs_permutation(fixture_names, costs)
+    reflected = order == FixtureGrouper.GRAY_ORDER
+    is_ordered = reflected or permutation != sorted(permutation)
+    if strength is None or strength >= len(ordered_groups):
+        if rules:
+            rows = pruned_product(radices, permutation, reflected, get_depth_checks(rules, permutation))
+        elif not is_ordered:
+            return itertools.product(*ordered_groups)
+        else:
+            rows = ordered_product(radices, permutation, reflected)
+    else:
+        if rules:
+            rows = constrained_covering_array(radices, strength, get_depth_checks(rules, range(len(radices))))
+        else:
+            rows = covering_array(radices, strength)
+        if is_ordered:
+            rows.sort(key=get_order_key(radices, permutation, reflected))
+    return (tuple(items[index] for items, index in zip(ordered_groups, row)) for row in rows)
+
+
+def get_overlaps(groups):
+    """
+    :param groups: sets of values of each fixture name for each group
+    :return: matrix of bools, True when two groups have any common combination
+    """
+    return [[index != other_index and all(values & other_values for values, other_values in zip(group, other))
+             for other_index, other in enumerate(groups)]
+            for index, group in enumerate(groups)]
+
+
+def subtract_box(box, other):
+    """
+    subtract other box from box, result is list of disjoint boxes
+
+    box = (0b11, 0b11)
+    other = (0b01, 0b01)
+
+    :return: [(0b10, 0b11),
+              (0b01, 0b10),
+              ]
+    """
+    common = tuple(mask & other_mask for mask, other_mask in zip(box, other))
+    if not all(common):
+        return [box]
+    boxes = []
+    for index, (mask, common_mask) in enumerate(zip(box, common)):
+        rest = mask & ~common_mask
+        if rest:
+            boxes.append(common[:index] + (rest,) + box[index + 1:])
+    return boxes
+
+
+def get_disjoint_boxes(boxes):
+    """
+    :return: boxes with same union, parts covered by previous boxes are subtracted
+    """
+    disjoint = []
+    for index, box in enumerate(boxes):
+        rest = [box]
+        for other_box in boxes[:index]:
+            rest = [piece for rest_box in rest for piece in subtract_box(rest_box, other_box)]
+        disjoint.extend(rest)
+    return disjoint
+
+
+def iter_bits(mask):
+    index = 0
+    while mask:
+        if mask & 1:
+            yield index
+        mask >>= 1
+        index += 1
 
 
 def extract_fixture_names(fixture_combinations):
@@ -0,0 +1,105 @@
+import itertools
+
+
+def get_costs_permutation(fixture_names, costs):
+    """
+    :return: indexes of fixture_names, the most expensive fixture first (it changes least often)
+
+    get_costs_permutation(['a', 'b', 'c'], {'c': 10, 'b': 1}) == [2, 1, 0]
+    """
+    costs = costs or {}
+    return sorted(range(len(fixture_names)), key=lambda index: -costs.get(fixture_names[index], 0))
+
+
+def ordered_product(radices, permutation, reflected=False):
+    """
+    generate indexes of cartesian product, columns in permutation change from the slowest to the fastest
+
+    reflected product (mixed radix gray code) changes only one column between two following rows
+
+    ordered_product([2, 3], [0, 1], reflected=True)
+
+    :return: ((0, 0), (0, 1), (0, 2), (1, 2), (1, 1), (1, 0))
+    """
+    permuted = [radices[index] for index in permutation]
+    for digits in itertools.product(*(range(radix) for radix in permuted)):
+        if reflected:
+            digits = reflect(digits, permuted)
+        row = [None] * len(radices)
+        for column, digit in zip(permutation, digits):
+            row[column] = digit
+        yield tuple(row)
+
+
+def get_order_key(radices, permutation, reflected=False):
+    """
+    :return: sort key function, rows sorted by the key are in same order as `ordered_product` generates them
+    """
+    permuted = [radices[index] for index in permutation]
+
+    def order_key(row):
+        digits = [row[index] for index in permutation]
+        if reflected:
+            digits = unreflect(digits, permuted)
+        return tuple(digits)
+    return order_key
+
+
+def get_parity(parity, digit, radix):
+    """
+    :return: parity of counter value of digits so far (value = value * radix + digit), digit is reflected
+        when the value of higher digits is odd
+    """
+    return (parity & radix & 1) ^ (digit & 1)
+
+
+def reflect(digits, radices):
+    parity = 0
+    reflected = []
+    for digit, radix in zip(digits, radices):
+        reflected.append(radix - 1 - digit if parity else digit)
+        parity = get_parity(parity, digit, radix)
+    return reflected
+
+
+def unreflect(digits, radices):
+    parity = 0
+    unreflected = []
+    for digit, radix in zip(digits, radices):
+        digit = radix - 1 - digit if parity else digit
+        unreflected.append(digit)
+        parity = get_parity(parity, digit, radix)
+    return unreflected
+
+
+def pruned_product(radices, permutation, reflected=False, checks=None, fixed=None):
+    """
+    same as `ordered_product`, but the product tree is pruned as soon as partial row fails any check,
+    time is proportional to number of valid rows
+
+    :param checks: list of functions for each depth (column in permutation),
+        function gets row with columns set so far and returns False for invalid row
+    :param fixed: {column: value} columns with only one value
+    """
+    checks = checks or [()] * len(permutation)
+    fixed = fixed or {}
+    row = [None] * len(radices)
+
+    def assign(depth, parity):
+        if depth == len(permutation):
+            yield tuple(row)
+            return
+        column = permutation[depth]
+        radix = radices[column]
+        for digit in range(radix):
+            value = radix - 1 - digit if parity else digit
+            if column in fixed and fixed[column] != value:
+                continue
+            row[column] = value
+            if all(check(row) for check in checks[depth]):
+                yield from assign(depth + 1, get_parity(parity, digit, radix) if reflected else 0)
+        row[column] = None
+
+    if not all(radices):
+        return iter(())
+    return assign(0, 0)
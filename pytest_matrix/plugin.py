@@ -1,10 +1,130 @@
+import copy
+import functools
+import json
+import random
+import warnings
+from collections import OrderedDict, defaultdict
+
 import pytest
+from _pytest.fixtures import scopes
 from pytest_lazyfixture import is_lazy_fixture
 
+from pytest_matrix import exceptions
+from pytest_matrix.batching import ParameterSets, get_batch, get_batches, run_batch
+from pytest_matrix.concurrency import prefetch_fixtures
+from pytest_matrix.cover_report import CoverReport
+from pytest_matrix.fork import is_fork_supported, run_forked
 from pytest_matrix.mixin import MatrixTestBase, FixtureGrouper
+from pytest_matrix.profiling import profiler
+from pytest_matrix.sampling import parse_sample_size
+from pytest_matrix.selection import (FailureIndex, get_coverage_units, get_failure_inducing, parse_duration,
+                                     select_by_budget, select_covering, update_failures)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('matrix')
+    group.addoption('--matrix-max-items', dest='matrix_max_items', type=int, default=None,
+                    help="maximum number of combinations generated for one test (ini: matrix_max_items)")
+    group.addoption('--matrix-max-session-items', dest='matrix_max_session_items', type=int, default=None,
+                    help="maximum number of combinations generated in whole session "
+                         "(ini: matrix_max_session_items)")
+    group.addoption('--matrix-budget', dest='matrix_budget', choices=MatrixSession.BUDGET_ACTIONS, default=None,
+                    help="what to do when number of combinations exceeds the limit, 'fail' (default) or 'warn' "
+                         "(ini: matrix_budget)")
+    group.addoption('--matrix-plan-cache', dest='matrix_plan_cache', action='store_true', default=None,
+                    help="store compiled combinations in pytest cache and reuse them while configuration "
+                         "is not changed (ini: matrix_plan_cache)")
+    group.addoption('--matrix-affinity', dest='matrix_affinity', action='store_true', default=False,
+                    help="with pytest-xdist send tests sharing expensive fixture values to same worker")
+    group.addoption('--matrix-sample', dest='matrix_sample', default=None, metavar='N|FRACTION',
+                    help="run only random sample of combinations of each matrix test, number of combinations "
+                         "or fraction (every fixture value is used at least once)")
+    group.addoption('--matrix-seed', dest='matrix_seed', type=int, default=None,
+                    help="seed of --matrix-sample, random by default (printed in header)")
+    group.addoption('--matrix-time-budget', dest='matrix_time_budget', default=None, metavar='DURATION',
+                    help="run only combinations covering the most pairs of fixture values in given time "
+                         "(e.g. 90, 90s, 10m, 1h), durations of combinations are taken from previous runs")
+    group.addoption('--matrix-cover-report', dest='matrix_cover_report', default=None, metavar='PATH',
+                    help="write coverage of fixture values and their pairs by all generated tests "
+                         "to json (or html for .html path)")
+    group.addoption('--matrix-fork', dest='matrix_fork', action='store_true', default=False,
+                    help="run each generated test in forked process, shared fixtures are set up once "
+                         "in parent process (only where os.fork is available)")
+    group.addoption('--matrix-failfast-values', dest='matrix_failfast_values', action='store_true', default=False,
+                    help="skip generated tests using matrix fixture value, which failed in setup of previous test")
+    group.addoption('--matrix-lf', dest='matrix_last_failed', action='store_true', default=False,
+                    help="run only generated tests sharing pair of fixture values with combinations failed "
+                         "in last run (fixture values are compared, so it works also after combinations change)")
+    group.addoption('--matrix-ff', dest='matrix_failed_first', action='store_true', default=False,
+                    help="run generated tests sharing fixture values with combinations failed in last run first")
+    group.addoption('--matrix-adaptive', dest='matrix_adaptive', action='store_true', default=False,
+                    help="run generated tests covering all pairs of fixture values first, then tests sharing pair "
+                         "of fixture values with failed ones, minimal failure-inducing values are in summary")
+    group.addoption('--matrix-profile', dest='matrix_profile', action='store_true', default=False,
+                    help="show time, memory and number of combinations of matrix generation")
+    group.addoption('--matrix-profile-json', dest='matrix_profile_json', default=None, metavar='PATH',
+                    help="write matrix generation profile to json file")
+    parser.addini('matrix_max_items', "maximum number of combinations generated for one test")
+    parser.addini('matrix_max_session_items', "maximum number of combinations generated in whole session")
+    parser.addini('matrix_budget', "'fail' or 'warn' when number of combinations exceeds the limit", default='fail')
+    parser.addini('matrix_plan_cache', "store compiled combinations in pytest cache", type='bool', default=False)
+    parser.addini('matrix_affinity_fixtures', "names of expensive fixtures used by --matrix-affinity", type='args')
 
 
 def pytest_generate_tests(metafunc):
+    grouper = get_grouper(metafunc)
+    if grouper is not None:
+        nodeid = metafunc.definition.nodeid
+        with profiler.measure('generate', nodeid):
+            session = get_session(metafunc.config)
+            session.register_items_plugin()
+            if session.sample is not None:
+                plan = session.get_sample_plan(nodeid, grouper)
+                session.check_budget(nodeid, grouper, len(plan['combinations']))
+            else:
+                session.check_budget(nodeid, grouper)
+                plan = session.get_plan(grouper)
+            if session.cover_report is not None:
+                if plan is None:
+                    plan = grouper.get_plan()
+                session.cover_report.add(nodeid, grouper.fixture_names, plan)
+            session.matrix_tests[nodeid] = grouper
+            with profiler.measure('parametrize', nodeid) as record:
+                parametrize_data = grouper.get_parametrize_data(metafunc.fixturenames, plan)
+                if grouper.options.get('batch'):
+                    session.batches[nodeid] = ParameterSets(functools.partial(grouper.generate_parameter_sets, plan))
+                    count = len(plan['combinations']) if plan is not None else grouper.count()
+                    parametrize_data['argvalues'] = [
+                        pytest.param(*[batch] * len(grouper.fixture_names), id=batch.id)
+                        for batch in get_batches(count, grouper.options['batch'])]
+                if record is not None:
+                    parametrize_data['argvalues'] = profiler.count_parameter_sets(record,
+                                                                                  parametrize_data['argvalues'])
+                metafunc.fixturenames = parametrize_data['argnames']
+                metafunc.parametrize(**parametrize_data)
+            with profiler.measure('bind', nodeid):
+                bind_fixturedefs(metafunc, grouper.get_lazy_fixture_names())
+                if grouper.options.get('cache'):
+                    session.fixture_cache.add(metafunc, grouper)
+
+
+def bind_fixturedefs(metafunc, fixture_names):
+    """
+    resolve definitions of lazy fixtures (and fixtures they depend on) once for the test function,
+    generated tests share them, so fixtures are not looked up again for each combination during setup
+    """
+    if not fixture_names:
+        return
+    fixturemanager = metafunc.config.pluginmanager.get_plugin('funcmanage')
+    _, _, arg2fixturedefs = fixturemanager.getfixtureclosure(fixture_names, metafunc.definition.parent)
+    for name, fixturedefs in arg2fixturedefs.items():
+        metafunc._arg2fixturedefs.setdefault(name, fixturedefs)
+
+
+def get_grouper(metafunc):
+    """
+    :return: FixtureGrouper for test function marked 'matrix' or defined in MatrixTestBase class, otherwise None
+    """
     marker = None
     try:
         markers = metafunc.function.pytestmark
@@ -16,50 +136,724 @@ def pytest_generate_tests(metafunc):
     except AttributeError:
         pass
     if marker is not None:
-        all_fixture_names = metafunc.fixturenames
-        grouper = FixtureGrouper(marker.kwargs['names'], marker.kwargs['combs'])
-        parametrize_data = grouper.get_parametrize_data(all_fixture_names)
-        metafunc.fixturenames = parametrize_data['argnames']
-        metafunc.parametrize(**parametrize_data)
+        options = {option: value for option, value in marker.kwargs.items() if option not in ('names', 'combs')}
+        return FixtureGrouper(marker.kwargs['names'], marker.kwargs['combs'], **options)
     elif isinstance(metafunc.cls, MatrixTestBase):
         function_name = metafunc.function.__name__
         if metafunc.cls.should_be_parametrize(function_name):
-            all_fixture_names = metafunc.fixturenames
-            parametrize_data = get_paramatrized_data(metafunc.cls, function_name, all_fixture_names)
-            metafunc.fixturenames = parametrize_data['argnames']
-            metafunc.parametrize(**parametrize_data)
+            return get_class_grouper(metafunc.cls, function_name)
+    return None
 
 
-def pytest_configure(config):
-    config.addinivalue_line("markers", "matrix: for fixture matrix combinations")
+class MatrixSession:
+    """
+    state of matrix generation shared by whole test session
+    """
+
+    PLUGIN_NAME = 'matrix_session'
+    PLAN_CACHE_PREFIX = 'matrix/plans/'
+    SETUP_COSTS_KEY = 'matrix/setup_costs'
+    AFFINITY_FIXTURES_KEY = 'matrix/affinity_fixtures'
+    DURATIONS_KEY = 'matrix/durations'
+    FAILURES_KEY = 'matrix/failures'
+    DEFAULT_DURATION = 1.0
+
+    FAIL_BUDGET = 'fail'
+    WARN_BUDGET = 'warn'
+    BUDGET_ACTIONS = (FAIL_BUDGET, WARN_BUDGET)
+
+    def __init__(self, config):
+        self.config = config
+        self.max_items = get_int_option(config, 'matrix_max_items')
+        self.max_session_items = get_int_option(config, 'matrix_max_session_items')
+        self.budget_action = config.getoption('matrix_budget') or config.getini('matrix_budget')
+        if self.budget_action not in self.BUDGET_ACTIONS:
+            raise pytest.UsageError("matrix_budget must be one of: " + ', '.join(self.BUDGET_ACTIONS))
+        self.session_items = 0
+        self.plan_cache = config.getoption('matrix_plan_cache') or config.getini('matrix_plan_cache')
+        if getattr(config, 'cache', None) is None:
+            self.plan_cache = False
+        self.affinity = config.getoption('matrix_affinity')
+        self.sample = config.getoption('matrix_sample')
+        if self.sample is not None:
+            try:
+                self.sample = parse_sample_size(self.sample)
+            except ValueError as e:
+                raise pytest.UsageError("--matrix-sample: {e}".format_map(vars()))
+        if hasattr(config, 'workerinput'):
+            self.seed = config.workerinput['matrix_seed']
+        else:
+            self.seed = config.getoption('matrix_seed')
+            if self.seed is None:
+                self.seed = random.randrange(2 ** 32)
+        self.profile = config.getoption('matrix_profile') or config.getoption('matrix_profile_json')
+        if self.profile:
+            profiler.enable()
+        self.time_budget = config.getoption('matrix_time_budget')
+        if self.time_budget is not None:
+            try:
+                self.time_budget = parse_duration(self.time_budget)
+            except ValueError as e:
+                raise pytest.UsageError("--matrix-time-budget: {e}".format_map(vars()))
+        self.budget_summary = None
+        self.fork = config.getoption('matrix_fork')
+        if self.fork and not is_fork_supported():
+            raise pytest.UsageError("--matrix-fork is not supported on this platform")
+        self.failfast_values = config.getoption('matrix_failfast_values')
+        self.failed_values = {}
+        self.failfast_skipped = 0
+        self.last_failed = config.getoption('matrix_last_failed')
+        self.failed_first = config.getoption('matrix_failed_first')
+        self.last_failed_summary = None
+        self.failures = defaultdict(dict)
+        self.adaptive = config.getoption('matrix_adaptive')
+        if self.adaptive and (getattr(config.option, 'numprocesses', None)
+                              or getattr(config.option, 'dist', 'no') != 'no'):
+            raise pytest.UsageError("--matrix-adaptive is not supported with pytest-xdist")
+        self.adaptive_session = None
+        self.adaptive_pool = {}
+        self.adaptive_covering = set()
+        self.adaptive_counts = None
+        self.cover_report = CoverReport() if config.getoption('matrix_cover_report') else None
+        self.matrix_tests = {}
+        self.batches = {}
+        self.fixture_cache = MatrixFixtureCache()
+        self.setup_durations = defaultdict(list)
+        self.affinity_fixtures = defaultdict(dict)
+        self.durations = defaultdict(lambda: defaultdict(float))
+
+    def check_budget(self, nodeid, grouper, count=None):
+        if self.max_items is None and self.max_session_items is None:
+            return
+        if count is None:
+            count = grouper.count()
+        if self.max_items is not None and count > self.max_items:
+            self.exceed_budget("{nodeid} generates {count} combinations, limit is {self.max_items} "
+                               "(matrix_max_items)".format_map(vars()))
+        generated = self.session_items
+        self.session_items += count
+        if self.max_session_items is None or self.session_items <= self.max_session_items:
+            return
+        if generated <= self.max_session_items or self.budget_action == self.FAIL_BUDGET:
+            self.exceed_budget("{nodeid} exceeds session limit of {self.max_session_items} combinations, "
+                               "already generated {self.session_items} (matrix_max_session_items)"
+                               .format_map(vars()))
+
+    def get_plan(self, grouper):
+        """
+        :return: compiled plan of grouper loaded from cache or None when plan cache is disabled
+        """
+        if not self.plan_cache:
+            return None
+        key = grouper.get_plan_key()
+        if key is None:
+            return None
+        key = self.PLAN_CACHE_PREFIX + key
+        plan = self.config.cache.get(key, None)
+        if plan is None:
+            plan = grouper.get_plan()
+            self.config.cache.set(key, plan)
+        return plan
+
+    def register_items_plugin(self):
+        """
+        hooks of matrix items are registered only when the first matrix test or class is collected,
+        sessions without matrix tests do not call them for every item and fixture
+        """
+        if not self.config.pluginmanager.has_plugin(MatrixItemsPlugin.PLUGIN_NAME):
+            self.config.pluginmanager.register(MatrixItemsPlugin(self), MatrixItemsPlugin.PLUGIN_NAME)
+
+    def get_sample_plan(self, nodeid, grouper):
+        """
+        :return: plan of sampled combinations, random generator is seeded by session seed and nodeid,
+            so sample of each test does not depend on other tests
+        """
+        rng = random.Random("{}:{}".format(self.seed, nodeid))
+        return grouper.get_sample_plan(self.sample, rng)
+
+    def pytest_report_header(self, config):
+        if self.sample is not None:
+            return "matrix: sample {}, seed {} (--matrix-seed={})".format(self.sample, self.seed, self.seed)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_configure_node(self, node):
+        """ xdist workers have to generate same sample """
+        node.workerinput['matrix_seed'] = self.seed
+
+    def get_grouper(self, item):
+        return self.matrix_tests.get(get_function_nodeid(item))
+
+    def skip_failed_values(self, item):
+        """
+        skip generated test using matrix fixture value (definition of lazy fixture), which failed in setup
+        of previous test
+        """
+        request = item._request
+        for value in item.callspec.params.values():
+            if not is_lazy_fixture(value):
+                continue
+            fixturedefs = (request._arg2fixturedefs.get(value.name)
+                           or request._fixturemanager.getfixturedefs(value.name, item.nodeid))
+            if fixturedefs:
+                nodeid = self.failed_values.get((fixturedefs[-1].baseid, value.name))
+                if nodeid is not None:
+                    item.matrix_skipped_value = value.name
+                    pytest.skip("matrix fixture value '{value.name}' failed in setup of {nodeid}".format_map(vars()))
+
+    def get_batch(self, item):
+        """
+        :return: `Batch` of item running many combinations or None
+        """
+        grouper = self.get_grouper(item)
+        if grouper is None or not grouper.options.get('batch'):
+            return None
+        return get_batch(item, grouper.fixture_names)
+
+    def pytest_collection_modifyitems(self, session, config, items):
+        """
+        generated tests of one class (or module) are sorted, so tests sharing value of the most expensive fixture
+        (by 'costs' option) are run one after another
+        """
+        if self.time_budget is not None:
+            self.select_by_time_budget(config, items)
+        if self.last_failed or self.failed_first:
+            self.select_by_failures(config, items)
+        if self.adaptive:
+            self.select_adaptive(session, items)
+        if not any(grouper.options.get('costs') for grouper in self.matrix_tests.values()):
+            return
+        start = 0
+        for end in range(1, len(items) + 1):
+            if end == len(items) or items[end].parent is not items[start].parent:
+                run = items[start:end]
+                items[start:end] = sort_by_costs(run, [self.get_grouper(item) for item in run])
+                start = end
+
+    def select_by_failures(self, config, items):
+        """
+        --matrix-lf deselects generated tests, which do not share any suspicious pair of fixture values
+        of combinations failed in last runs, --matrix-ff moves tests sharing the most suspicious pairs
+        and failed values to the beginning
+        (tests in batch are not reordered nor deselected)
+        """
+        history = self.get_failures()
+        if not history:
+            return
+        indexes = {}
+        scores = {}
+        for item in items:
+            if self.get_grouper(item) is None or self.get_batch(item) is not None:
+                continue
+            function_nodeid = get_function_nodeid(item)
+            if function_nodeid not in indexes:
+                failures = history.get(function_nodeid, {'combinations': [], 'pairs': []})
+                indexes[function_nodeid] = FailureIndex(failures)
+            scores[item] = indexes[function_nodeid].get_score(FixtureGrouper.split_ids(item.nodeid))
+        if self.last_failed:
+            deselected = [item for item, (pairs, _) in scores.items() if not pairs]
+            if deselected:
+                deselected_items = set(deselected)
+                config.hook.pytest_deselected(items=deselected)
+                items[:] = [item for item in items if item not in deselected_items]
+            self.last_failed_summary = (len(scores) - len(deselected), len(scores))
+        if self.failed_first:
+            items.sort(key=lambda item: scores.get(item, (0, 0)), reverse=True)
+
+    def select_by_time_budget(self, config, items):
+        """
+        deselect generated tests, which do not fit into time budget, duration of combination without history
+        is average duration of its test function (or of all combinations, or DEFAULT_DURATION)
+        """
+        matrix_items = [item for item in items
+                        if self.get_grouper(item) is not None and self.get_batch(item) is None]
+        history = self.get_durations()
+        known = [duration for durations in history.values() for duration in durations.values()]
+        default = sum(known) / len(known) if known else self.DEFAULT_DURATION
+        candidates = []
+        for item in matrix_items:
+            function_nodeid = get_function_nodeid(item)
+            durations = history.get(function_nodeid, {})
+            duration = durations.get(item.callspec.id)
+            if duration is None:
+                duration = sum(durations.values()) / len(durations) if durations else default
+            units = {(function_nodeid,) + unit for unit in get_coverage_units(FixtureGrouper.split_ids(item.nodeid))}
+            candidates.append((units, duration))
+        selected = select_by_budget(candidates, self.time_budget)
+        deselected = {item for index, item in enumerate(matrix_items) if index not in selected}
+        if deselected:
+            config.hook.pytest_deselected(items=[item for item in items if item in deselected])
+            items[:] = [item for item in items if item not in deselected]
+        self.budget_summary = (len(selected), len(matrix_items),
+                               sum(candidates[index][1] for index in selected), self.time_budget)
+
+    def select_adaptive(self, session, items):
+        """
+        run only generated tests covering all pairs of fixture values of each test function, other tests are kept
+        in pool and added by `expand_adaptive` when covering test fails (tests in batch are always run)
+        """
+        function_items = defaultdict(list)
+        for item in items:
+            if self.get_grouper(item) is not None and self.get_batch(item) is None:
+                function_items[get_function_nodeid(item)].append(item)
+        pooled = set()
+        for function_nodeid, candidates in function_items.items():
+            selected, _ = select_covering([(get_coverage_units(FixtureGrouper.split_ids(item.nodeid)), 1)
+                                           for item in candidates])
+            pool = [item for index, item in enumerate(candidates) if index not in selected]
+            self.adaptive_pool[function_nodeid] = pool
+            pooled.update(pool)
+            self.adaptive_covering.update(candidates[index].nodeid for index in selected)
+        items[:] = [item for item in items if item not in pooled]
+        self.adaptive_session = session
+        self.adaptive_counts = {'covering': len(self.adaptive_covering),
+                                'total': sum(map(len, function_items.values())), 'expanded': 0}
+
+    def expand_adaptive(self, report):
+        """
+        pooled tests sharing pair of fixture values with failed covering test are run after the test following it,
+        pytest already passed the following test as `nextitem` to the failed one, so fixtures are torn down
+        only as far as they would be without expansion (when failed test is the last one, expanded tests set up
+        session fixtures again)
+        """
+        self.adaptive_covering.discard(report.nodeid)
+        pool = self.adaptive_pool.get(report.matrix_test)
+        if not pool:
+            return
+        units = get_coverage_units(FixtureGrouper.split_ids(report.nodeid))
+        added = [item for item in pool if units.intersection(get_coverage_units(FixtureGrouper.split_ids(item.nodeid)))]
+        if not added:
+            return
+        added_items = set(added)
+        self.adaptive_pool[report.matrix_test] = [item for item in pool if item not in added_items]
+        items = self.adaptive_session.items
+        index = next(index for index, item in enumerate(items) if item.nodeid == report.nodeid)
+        items[index + 2:index + 2] = added
+        self.adaptive_session.testscollected += len(added)
+        self.adaptive_counts['expanded'] += len(added)
+
+    def get_failures(self):
+        """
+        :return: {function nodeid: failed combinations and suspicious pairs (`update_failures`)} from last runs
+        """
+        cache = getattr(self.config, 'cache', None)
+        return cache.get(self.FAILURES_KEY, {}) if cache is not None else {}
+
+    def get_durations(self):
+        cache = getattr(self.config, 'cache', None)
+        return cache.get(self.DURATIONS_KEY, {}) if cache is not None else {}
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self.cover_report is not None and not hasattr(self.config, 'workerinput'):
+            if self.config.pluginmanager.has_plugin('dsession'):
+                terminalreporter.write_line("matrix cover report is not created by xdist controller, "
+                                            "run it with --collect-only")
+            else:
+                path = self.config.getoption('matrix_cover_report')
+                self.cover_report.write(path)
+                terminalreporter.write_line("matrix cover report: {path}".format_map(vars()))
+        if self.failed_values:
+            terminalreporter.write_line("matrix failfast: {} fixture values failed in setup, skipped {} tests: {}"
+                                        .format(len(self.failed_values), self.failfast_skipped,
+                                                ', '.join(sorted(name for _, name in self.failed_values))))
+        if self.last_failed_summary is not None:
+            terminalreporter.write_line("matrix last failed: selected {} of {} combinations".format(
+                *self.last_failed_summary))
+        if self.adaptive_counts is not None:
+            self.write_adaptive_summary(terminalreporter)
+        if self.budget_summary is not None:
+            terminalreporter.write_line("matrix time budget: selected {} of {} combinations, "
+                                        "estimated {:.1f}s of {:.1f}s".format(*self.budget_summary))
+        if not self.profile:
+            return
+        records = profiler.get_sorted_records()
+        json_path = self.config.getoption('matrix_profile_json')
+        if json_path:
+            with open(json_path, 'w') as f:
+                json.dump(records, f, indent=2)
+        if self.config.getoption('matrix_profile'):
+            terminalreporter.write_sep('=', 'matrix profile')
+            line = "{:<12} {:>6} {:>10} {:>13} {:>10} {:>12}  {}"
+            terminalreporter.write_line(line.format('section', 'calls', 'time [s]', 'combinations', 'id bytes',
+                                                    'memory [kB]', 'name'))
+            for record in records:
+                terminalreporter.write_line(line.format(record['section'], record['calls'],
+                                                        '%.4f' % record['time'], record['combinations'],
+                                                        record['id_bytes'], record['memory'] // 1024,
+                                                        record['name']))
+
+    def write_adaptive_summary(self, terminalreporter):
+        terminalreporter.write_sep('=', 'matrix adaptive')
+        counts = self.adaptive_counts
+        terminalreporter.write_line("ran {} of {} combinations, {expanded} added around failures".format(
+            counts['covering'] + counts['expanded'], counts['total'], **counts))
+        for matrix_test, results in sorted(self.failures.items()):
+            if not any(results.values()):
+                continue
+            inducing = get_failure_inducing(results)
+            if inducing:
+                values = '; '.join(FixtureGrouper.ID_SEPARATOR.join(ids) for ids in inducing)
+            else:
+                values = "no single value or pair of values"
+            terminalreporter.write_line("{matrix_test}: failure-inducing values: {values}".format_map(vars()))
+
+    def pytest_collection_finish(self, session):
+        """ only collection is profiled, tests are run without tracemalloc """
+        if self.profile:
+            profiler.disable()
+
+    def pytest_unconfigure(self, config):
+        if self.profile:
+            profiler.disable()
+
+    def get_setup_costs(self):
+        """
+        :return: {fixture name: {id: setup time}}
+        """
+        cache = getattr(self.config, 'cache', None)
+        costs = cache.get(self.SETUP_COSTS_KEY, {}) if cache is not None else {}
+        return {name: ids for name, ids in costs.items() if isinstance(ids, dict)}
+
+    def get_affinity_fixtures(self):
+        """
+        :return: {test function nodeid: {ids: [[fixture name, id], ...]}}
+        """
+        cache = getattr(self.config, 'cache', None)
+        return cache.get(self.AFFINITY_FIXTURES_KEY, {}) if cache is not None else {}
+
+    def pytest_runtest_logreport(self, report):
+        matrix_test = getattr(report, 'matrix_test', None)
+        fixtures = getattr(report, 'matrix_fixtures', None)
+        if self.affinity and report.when == 'setup' and fixtures is not None:
+            self.affinity_fixtures[matrix_test][report.nodeid[len(matrix_test) + 1:-1]] = fixtures
+            for name, fixture_id in fixtures:
+                self.setup_durations[name, fixture_id].append(report.duration)
+        if matrix_test is not None:
+            self.durations[matrix_test][report.nodeid[len(matrix_test) + 1:-1]] += report.duration
+            if report.failed:
+                self.failures[matrix_test][FixtureGrouper.split_ids(report.nodeid)] = True
+            elif report.when == 'call' and report.passed:
+                self.failures[matrix_test].setdefault(FixtureGrouper.split_ids(report.nodeid), False)
+            if report.failed and report.nodeid in self.adaptive_covering:
+                self.expand_adaptive(report)
+        failed_value = getattr(report, 'matrix_failed_value', None)
+        if failed_value is not None:
+            self.failed_values.setdefault(tuple(failed_value), report.nodeid)
+        if getattr(report, 'matrix_skipped_value', None) is not None:
+            self.failfast_skipped += 1
+
+    def pytest_sessionfinish(self, session):
+        if hasattr(self.config, 'workerinput') or getattr(self.config, 'cache', None) is None:
+            return
+        if self.setup_durations:
+            costs = self.get_setup_costs()
+            for (name, fixture_id), durations in self.setup_durations.items():
+                duration = sum(durations) / len(durations)
+                ids = costs.setdefault(name, {})
+                ids[fixture_id] = (ids[fixture_id] + duration) / 2 if fixture_id in ids else duration
+            self.config.cache.set(self.SETUP_COSTS_KEY, costs)
+            history = self.get_affinity_fixtures()
+            for matrix_test, fixtures in self.affinity_fixtures.items():
+                history.setdefault(matrix_test, {}).update(fixtures)
+            self.config.cache.set(self.AFFINITY_FIXTURES_KEY, history)
+        if self.durations:
+            history = self.get_durations()
+            for matrix_test, durations in self.durations.items():
+                history.setdefault(matrix_test, {}).update(durations)
+            self.config.cache.set(self.DURATIONS_KEY, history)
+        if self.failures:
+            history = self.get_failures()
+            for matrix_test, results in self.failures.items():
+                history[matrix_test] = update_failures(history.get(matrix_test), results)
+            self.config.cache.set(self.FAILURES_KEY, {test: failures for test, failures in history.items()
+                                                      if failures is not None})
+
+    def exceed_budget(self, msg):
+        if self.budget_action == self.WARN_BUDGET:
+            warnings.warn(exceptions.MatrixBudgetWarning(msg))
+        else:
+            raise exceptions.MatrixBudgetExceeded(msg)
 
 
-def pytest_itemcollected(item):
-    if isinstance(item.cls, MatrixTestBase) and item.name in item.cls.SKIP_TESTS:
-        item.add_marker(pytest.mark.skip())
+class MatrixFixtureCache:
+    """
+    values of matrix fixtures (option 'cache') are kept for whole session, only `size` the least recently used
+    values of each fixture name of each test function are kept, older values are torn down
+    """
+
+    SCOPE = 'session'
+
+    def __init__(self):
+        self.sizes = {}
+        self.entries = defaultdict(OrderedDict)
+
+    def add(self, metafunc, grouper):
+        """
+        lazy fixtures of cached fixture names are bound to the test function as session scoped copies of their
+        definitions, so pytest does not tear them down after each test and other tests using the same fixtures
+        are not affected (definitions are already bound by `bind_fixturedefs`)
+        """
+        nodeid = metafunc.definition.nodeid
+        for fixture_name, size in grouper.options['cache'].items():
+            self.sizes[nodeid, fixture_name] = size
+            for name in grouper.get_lazy_value_names(fixture_name):
+                fixturedefs = metafunc._arg2fixturedefs.get(name)
+                if fixturedefs:
+                    self.check_scopes(metafunc, name)
+                    metafunc._arg2fixturedefs[name] = tuple(fixturedefs[:-1]) + (self.copy(fixturedefs[-1]),)
+
+    def check_scopes(self, metafunc, name):
+        """
+        cached value is set up once for the session, so it can depend only on session scoped fixtures
+        """
+        names = [name]
+        seen = set(names)
+        while names:
+            fixturedefs = metafunc._arg2fixturedefs.get(names.pop())
+            if not fixturedefs:
+                continue
+            for argname in fixturedefs[-1].argnames:
+                dependencies = metafunc._arg2fixturedefs.get(argname)
+                if argname in seen or not dependencies:
+                    continue
+                seen.add(argname)
+                names.append(argname)
+                scope = dependencies[-1].scope
+                if scope != self.SCOPE:
+                    raise exceptions.InvalidGrouperOption('cache', "cached value '{name}' depends on fixture "
+                                                                   "'{argname}' with scope '{scope}', only session "
+                                                                   "scoped fixtures can be used".format_map(vars()))
+
+    def copy(self, fixturedef):
+        fixturedef = copy.copy(fixturedef)
+        fixturedef.scope = self.SCOPE
+        fixturedef.scopenum = scopes.index(self.SCOPE)
+        fixturedef.cached_result = None
+        fixturedef._finalizers = []
+        return fixturedef
+
+    def use_item(self, item, fixture_names):
+        request = item._request
+        nodeid = get_function_nodeid(item)
+        for fixture_name in fixture_names:
+            value = item.callspec.params.get(fixture_name)
+            if is_lazy_fixture(value) and value.name in request._arg2fixturedefs:
+                self.use((nodeid, fixture_name), request._arg2fixturedefs[value.name][-1], request)
+
+    def use(self, key, fixturedef, request):
+        """
+        mark value (fixturedef of lazy fixture) as recently used, before new value is set up, the least recently
+        used values over the limit are torn down
+
+        :param key: (nodeid of test function, fixture name)
+        """
+        entries = self.entries[key]
+        if fixturedef in entries:
+            entries.move_to_end(fixturedef)
+            return
+        size = self.sizes[key]
+        while size is not None and len(entries) >= size:
+            evicted, _ = entries.popitem(last=False)
+            evicted.finish(request)
+        entries[fixturedef] = None
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_make_scheduler(config, log):
+    session = get_session(config)
+    if session.affinity:
+        from pytest_matrix.scheduling import MatrixAffinityScheduling
+        return MatrixAffinityScheduling(config, log, costs=session.get_setup_costs(),
+                                        fixture_names=config.getini('matrix_affinity_fixtures'),
+                                        fixtures=session.get_affinity_fixtures())
+
+
+def get_session(config):
+    return config.pluginmanager.get_plugin(MatrixSession.PLUGIN_NAME)
+
+
+def sort_by_costs(items, groupers):
+    """
+    items using the most expensive fixture are sorted by its value within positions they already occupy,
+    other items are not moved
+    """
+    costs = {}
+    for grouper in groupers:
+        if grouper is not None:
+            for name, cost in grouper.options.get('costs', {}).items():
+                costs[name] = max(cost, costs.get(name, cost))
+    if not costs:
+        return items
+    name = max(costs, key=costs.get)
+    first_seen = {}
+    positions = []
+    for position, item in enumerate(items):
+        value = get_param_id(item, name)
+        if value is not None:
+            first_seen.setdefault(value, len(first_seen))
+            positions.append(position)
+    items = list(items)
+    for position, item in zip(positions, sorted([items[position] for position in positions],
+                                                key=lambda item: first_seen[get_param_id(item, name)])):
+        items[position] = item
+    return items
+
+
+def get_param_id(item, name):
+    callspec = getattr(item, 'callspec', None)
+    if callspec is None or name not in callspec.params:
+        return None
+    value = callspec.params[name]
+    return value.name if is_lazy_fixture(value) else repr(value)
+
+
+def get_function_nodeid(item):
+    callspec = getattr(item, 'callspec', None)
+    if callspec is None:
+        return item.nodeid
+    return item.nodeid[:-len(callspec.id) - 2]
+
+
+def get_int_option(config, name):
+    value = config.getoption(name)
+    if value is None:
+        value = config.getini(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise pytest.UsageError("{name} must be integer, not: '{value}'".format_map(vars()))
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "matrix: for fixture matrix combinations")
+    config.pluginmanager.register(MatrixSession(config), MatrixSession.PLUGIN_NAME)
 
 
 def pytest_pycollect_makeitem(collector, name, obj):
     """ prevent collect anything from mixin class and do not collect inherited combocover tests """
     if isinstance(collector.cls, MatrixTestBase):
+        get_session(collector.config).register_items_plugin()
         if collector.cls.IS_MIXIN or (name.startswith('test_combocover')
                                       and name not in collector.cls.COMBINATIONS_COVER_TESTS):
             return []
 
 
-@pytest.hookimpl(hookwrapper=True)
-def pytest_fixture_setup(fixturedef, request):
-    outcome = yield
-    result = outcome.get_result()
-    if is_lazy_fixture(result):
-        result = request.getfixturevalue(result.name)
-        fixturedef.cached_result = (result, request.param_index, None)
-    return result
+class MatrixItemsPlugin:
+    """
+    hooks called for every collected item and every fixture setup, registered by `MatrixSession`
+    when matrix tests are collected
+    """
+
+    PLUGIN_NAME = 'matrix_items'
+
+    def __init__(self, session):
+        self.session = session
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        """ reports of generated tests know their test function, also on xdist controller """
+        outcome = yield
+        if self.session.get_grouper(item) is not None:
+            report = outcome.get_result()
+            report.matrix_test = get_function_nodeid(item)
+            if call.when == 'setup' and hasattr(item, 'matrix_fixtures'):
+                report.matrix_fixtures = [list(fixture) for fixture in item.matrix_fixtures]
+            if call.when == 'setup' and report.failed and hasattr(item, 'matrix_failed_value'):
+                report.matrix_failed_value = list(item.matrix_failed_value)
+            if call.when == 'setup' and hasattr(item, 'matrix_skipped_value'):
+                report.matrix_skipped_value = item.matrix_skipped_value
+
+    def pytest_itemcollected(self, item):
+        if isinstance(item.cls, MatrixTestBase) and item.name in item.cls._matrix_skip_tests:
+            item.add_marker(pytest.mark.skip())
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        """
+        batch items run their combinations as separate items, only failed and skipped combinations are reported,
+        with --matrix-fork generated tests (and combinations of batch) run in forked process
+        """
+        grouper = self.session.get_grouper(item)
+        batch = self.session.get_batch(item)
+        if grouper is None or (batch is None and not self.session.fork):
+            return None
+        item.ihook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+        if batch is not None:
+            parameter_sets = self.session.batches[get_function_nodeid(item)]
+            for reports in run_batch(item, nextitem, batch, grouper.fixture_names, parameter_sets,
+                                     run_forked if self.session.fork else None):
+                nodeid, location = reports[0].nodeid, reports[0].location
+                if nodeid != item.nodeid:
+                    item.ihook.pytest_runtest_logstart(nodeid=nodeid, location=location)
+                for report in reports:
+                    item.ihook.pytest_runtest_logreport(report=report)
+                if nodeid != item.nodeid:
+                    item.ihook.pytest_runtest_logfinish(nodeid=nodeid, location=location)
+        else:
+            for report in run_forked(item, nextitem):
+                item.ihook.pytest_runtest_logreport(report=report)
+        item.ihook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
+        return True
+
+    def pytest_runtest_setup(self, item):
+        """
+        with --matrix-affinity (fixture name, id) of the item are kept for its setup report (before
+        pytest-lazyfixture replaces lazy fixtures in callspec params by their values),
+        with --matrix-failfast-values tests using failed fixture values are skipped,
+        cached fixture values are marked as used (or old values are torn down) before fixtures are set up,
+        with option 'concurrent' lazy fixtures are set up in threads before other fixtures (this hook is called
+        before pytest sets up the item and after pytest-lazyfixture wraps filling of fixtures)
+        """
+        grouper = self.session.get_grouper(item)
+        if grouper is None:
+            return
+        if self.session.affinity and self.session.get_batch(item) is None:
+            item.matrix_fixtures = grouper.get_fixture_ids(item.callspec.params)
+        if self.session.failed_values:
+            self.session.skip_failed_values(item)
+        if grouper.options.get('cache'):
+            self.session.fixture_cache.use_item(item, grouper.options['cache'])
+        concurrent = grouper.options.get('concurrent')
+        if concurrent:
+            request = item._request
+            fillfixtures = request._fillfixtures
+            max_workers = None if concurrent is True else concurrent
+
+            def fill():
+                prefetch_fixtures(item, max_workers)
+                fillfixtures()
+            request._fillfixtures = fill
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        outcome = yield
+        if outcome.excinfo is not None:
+            if self.session.failfast_values:
+                self.mark_failed_value(fixturedef, request)
+            return
+        result = outcome.get_result()
+        if is_lazy_fixture(result):
+            result = request.getfixturevalue(result.name)
+            fixturedef.cached_result = (result, request.param_index, None)
+        return result
+
+    @staticmethod
+    def mark_failed_value(fixturedef, request):
+        """ remember matrix fixture value (lazy fixture of generated test), which failed first in setup """
+        item = getattr(request, '_pyfuncitem', None)
+        callspec = getattr(item, 'callspec', None)
+        if callspec is None or hasattr(item, 'matrix_failed_value'):
+            return
+        if any(is_lazy_fixture(value) and value.name == fixturedef.argname for value in callspec.params.values()):
+            item.matrix_failed_value = (fixturedef.baseid, fixturedef.argname)
 
 
 def get_paramatrized_data(cls, function_name, all_fixtures):
+    return get_class_grouper(cls, function_name).get_parametrize_data(all_fixtures)
+
+
+def get_class_grouper(cls, function_name):
     function_name = function_name[len(cls.TEST_FUNCTION_PREFIX):]
-    fixture_names = MatrixTestBase.get_fixtures_names(cls.__dict__, function_name)
-    fixture_combinations = MatrixTestBase.get_raw_fixtures_data(cls.__dict__, function_name)
-    grouper = FixtureGrouper(fixture_names, fixture_combinations)
-    return grouper.get_parametrize_data(all_fixtures)
+    fixture_names, fixture_combinations, options = cls.get_matrix_config(function_name)
+    return FixtureGrouper(fixture_names, fixture_combinations, **options)
@@ -0,0 +1,84 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class MatrixProfiler:
+    """
+    measure time, memory and generated combinations of matrix generation, disabled by default
+    """
+
+    FIELDS = ('section', 'name', 'calls', 'time', 'combinations', 'id_bytes', 'memory')
+
+    def __init__(self):
+        self.enabled = False
+        self.records = {}
+        self._started_tracemalloc = False
+        self._peaks = []
+
+    def enable(self):
+        self.enabled = True
+        self.records = {}
+        self._peaks = []
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def disable(self):
+        self.enabled = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def get_record(self, section, name):
+        try:
+            return self.records[section, name]
+        except KeyError:
+            record = self.records[section, name] = dict.fromkeys(self.FIELDS, 0)
+            record.update(section=section, name=name)
+            return record
+
+    @contextmanager
+    def measure(self, section, name):
+        """
+        measure time and memory of the block, memory is peak of allocated memory during the block
+        (only growth of allocated memory on python < 3.9), nested blocks reset the peak, so peaks of enclosing
+        blocks are kept in a stack
+        """
+        if not self.enabled:
+            yield None
+            return
+        record = self.get_record(section, name)
+        memory_before = tracemalloc.get_traced_memory()[0]
+        if hasattr(tracemalloc, 'reset_peak'):
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._peaks.append(memory_before)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['time'] += time.perf_counter() - start
+            record['calls'] += 1
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(self._peaks.pop(), peak)
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            memory = (peak if hasattr(tracemalloc, 'reset_peak') else current) - memory_before
+            record['memory'] = max(record['memory'], memory)
+
+    def count_parameter_sets(self, record, parameter_sets):
+        """
+        count combinations and bytes of ids of generated pytest.param objects
+        """
+        for parameter_set in parameter_sets:
+            record['combinations'] += 1
+            record['id_bytes'] += len(parameter_set.id.encode())
+            yield parameter_set
+
+    def get_sorted_records(self):
+        return sorted(self.records.values(), key=lambda record: record['time'], reverse=True)
+
+
+profiler = MatrixProfiler()
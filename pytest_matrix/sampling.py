@@ -0,0 +1,136 @@
+import bisect
+import math
+import operator
+import sys
+from functools import reduce
+
+
+def parse_sample_size(value):
+    """
+    parse_sample_size('10') == 10
+    parse_sample_size('0.1') == 0.1
+
+    :return: number of combinations (int) or fraction of combinations (float)
+    """
+    try:
+        size = int(value)
+    except ValueError:
+        size = float(value)
+        if not 0 < size <= 1:
+            raise ValueError("fraction must be in (0, 1]: '{value}'".format_map(vars()))
+        return size
+    if size < 1:
+        raise ValueError("number of combinations must be positive: '{value}'".format_map(vars()))
+    return size
+
+
+def get_sample_size(size, total):
+    if isinstance(size, float):
+        size = math.ceil(size * total)
+    return min(size, total)
+
+
+class BoxSpace:
+    """
+    index space of combinations in disjoint boxes, box is list of values for each dimension
+    (number of combinations is `total`, it can be bigger than maximal length of python sequence)
+
+    index of combination is offset of its box and mixed radix number of positions of its values,
+    the last dimension changes the fastest (same as cartesian product)
+    """
+
+    def __init__(self, boxes):
+        self.boxes = [box for box in boxes if all(box)]
+        self.offsets = []
+        self.total = 0
+        for box in self.boxes:
+            self.offsets.append(self.total)
+            self.total += reduce(operator.mul, map(len, box), 1)
+        self.values = [set() for _ in (self.boxes[0] if self.boxes else ())]
+        for box in self.boxes:
+            for values, box_values in zip(self.values, box):
+                values.update(box_values)
+
+    def get_row(self, index):
+        box_index = bisect.bisect_right(self.offsets, index) - 1
+        index -= self.offsets[box_index]
+        row = []
+        for values in reversed(self.boxes[box_index]):
+            index, digit = divmod(index, len(values))
+            row.append(values[digit])
+        return tuple(reversed(row))
+
+    def get_index(self, box_index, digits):
+        index = 0
+        for values, digit in zip(self.boxes[box_index], digits):
+            index = index * len(values) + digit
+        return self.offsets[box_index] + index
+
+    def get_value_index(self, dimension, value, rng, uncovered):
+        """
+        :param uncovered: values of each dimension, which should be preferred in other dimensions
+        :return: index of random combination with value in dimension
+        """
+        box_index = rng.choice([index for index, box in enumerate(self.boxes) if value in box[dimension]])
+        box = self.boxes[box_index]
+        digits = []
+        for values, dimension_uncovered in zip(box, uncovered):
+            preferred = [digit for digit, box_value in enumerate(values) if box_value in dimension_uncovered]
+            digits.append(rng.choice(preferred) if preferred else rng.randrange(len(values)))
+        digits[dimension] = box[dimension].index(value)
+        return self.get_index(box_index, digits)
+
+
+class ListSpace:
+    """
+    index space of already generated combinations
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.total = len(rows)
+        self.indexes = [{} for _ in (rows[0] if rows else ())]
+        for index, row in enumerate(rows):
+            for indexes, value in zip(self.indexes, row):
+                indexes.setdefault(value, []).append(index)
+        self.values = [set(indexes) for indexes in self.indexes]
+
+    def get_row(self, index):
+        return self.rows[index]
+
+    def get_value_index(self, dimension, value, rng, uncovered):
+        return max(self.indexes[dimension][value],
+                   key=lambda index: (sum(row_value in dimension_uncovered for row_value, dimension_uncovered
+                                          in zip(self.rows[index], uncovered)), rng.random()))
+
+
+def sample(space, size, rng):
+    """
+    choose indexes of `size` random combinations of space, every value of each dimension is present
+    at least once (even if more than `size` combinations is needed), combinations are not enumerated
+
+    combinations with not yet used values are chosen first, each of them uses as many unused values as possible
+
+    :param space: `BoxSpace` or `ListSpace`
+    :param rng: random.Random
+    :return: sorted indexes
+    """
+    chosen = set()
+    uncovered = [set(values) for values in space.values]
+    for dimension, values in enumerate(space.values):
+        for value in sorted(values):
+            if value in uncovered[dimension]:
+                index = space.get_value_index(dimension, value, rng, uncovered)
+                chosen.add(index)
+                for dimension_uncovered, row_value in zip(uncovered, space.get_row(index)):
+                    dimension_uncovered.discard(row_value)
+    if space.total > sys.maxsize:
+        # too big for random.sample, size is negligible to length of space, so there are only few collisions
+        while len(chosen) < size:
+            chosen.add(rng.randrange(space.total))
+    elif len(chosen) < size:
+        for index in rng.sample(range(space.total), size):
+            chosen.add(index)
+            if len(chosen) == size:
+                break
+    return sorted(chosen)
@@ -0,0 +1,58 @@
+from xdist.scheduler import LoadScopeScheduling
+
+from .mixin import FixtureGrouper
+
+
+class MatrixAffinityScheduling(LoadScopeScheduling):
+    """
+    distribute tests across xdist workers, tests sharing the most expensive fixture value are sent to same worker
+
+    test_file.py::test_fn[backend_postgres|cache_redis]   -> scope ('backend', 'backend_postgres')
+    test_file.py::test_fx[backend_postgres|queue_rabbit]  -> scope ('backend', 'backend_postgres')
+    test_file.py::test_other                              -> scope 'test_file.py'
+    """
+
+    def __init__(self, config, log=None, costs=None, fixture_names=(), fixtures=None):
+        super().__init__(config, log)
+        self.costs = costs or {}
+        self.fixture_names = fixture_names
+        self.fixtures = fixtures or {}
+
+    def _split_scope(self, nodeid):
+        key = get_affinity_key(self.get_fixtures(nodeid), self.costs, self.fixture_names)
+        if key is None:
+            return super()._split_scope(nodeid)
+        return key
+
+    def get_fixtures(self, nodeid):
+        """
+        :return: (fixture name, id) of fixtures of generated test recorded in previous run, before that
+            only ids of lazy fixtures named by `fixture_names` are known
+        """
+        fixture_ids = FixtureGrouper.split_ids(nodeid)
+        if not fixture_ids:
+            return []
+        ids = FixtureGrouper.ID_SEPARATOR.join(fixture_ids)
+        fixtures = self.fixtures.get(nodeid[:-len(ids) - 2], {}).get(ids)
+        if fixtures is not None:
+            return [tuple(fixture) for fixture in fixtures]
+        return [(name, fixture_id) for fixture_id in fixture_ids for name in self.fixture_names
+                if fixture_id.startswith(name + '_')]
+
+
+def get_affinity_key(fixtures, costs, fixture_names=()):
+    """
+    :param fixtures: (fixture name, id) of fixtures of one generated test
+    :param costs: recorded setup time of fixture ids {fixture name: {id: cost}}
+    :param fixture_names: names of fixtures preferred when grouping
+    :return: (fixture name, id) with the highest setup cost, fixtures of preferred names go first,
+        None when no fixture is preferred and no cost was recorded
+    """
+    def get_key(fixture):
+        name, fixture_id = fixture
+        return name in fixture_names, costs.get(name, {}).get(fixture_id, 0)
+
+    candidates = [fixture for fixture in fixtures if any(get_key(fixture))]
+    if not candidates:
+        return None
+    return max(candidates, key=get_key)
@@ -0,0 +1,160 @@
+import heapq
+import itertools
+import re
+from collections import defaultdict
+
+
+DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 60 * 60}
+DURATION_REGEX = re.compile(r'^\s*(\d+(?:\.\d*)?)\s*([smh]?)\s*$')
+
+
+def parse_duration(value):
+    """
+    parse_duration('90') == 90
+    parse_duration('10m') == 600
+
+    :return: duration in seconds
+    """
+    match = DURATION_REGEX.match(value)
+    if match is None:
+        raise ValueError("duration must be number of seconds, minutes (m) or hours (h), not: '{value}'"
+                         .format_map(vars()))
+    number, unit = match.groups()
+    return float(number) * DURATION_UNITS[unit]
+
+
+def get_coverage_units(fixture_ids):
+    """
+    :return: pairs of fixture ids of one combination, or the fixture id itself for combination of one fixture
+    """
+    fixture_ids = sorted(fixture_ids)
+    if len(fixture_ids) < 2:
+        return {tuple(fixture_ids)}
+    return set(itertools.combinations(fixture_ids, 2))
+
+
+def select_by_budget(candidates, budget):
+    """
+    choose combinations covering the most pairs of fixture values within time budget, combination with
+    the most uncovered pairs per second goes first (greedy, gains are recomputed lazily), when all pairs
+    are covered, remaining time is filled by combinations in original order
+
+    :param candidates: list of (units, duration), units are hashable pairs covered by combination
+    :param budget: time in seconds
+    :return: set of indexes of selected candidates
+    """
+    selected, remaining = select_covering(candidates, budget)
+    for index, (_, duration) in enumerate(candidates):
+        if index not in selected and duration <= remaining:
+            selected.add(index)
+            remaining -= duration
+    return selected
+
+
+def select_covering(candidates, budget=float('inf')):
+    """
+    greedy part of `select_by_budget`, without budget all units of candidates are covered
+
+    :return: (set of indexes of selected candidates, remaining budget)
+    """
+    selected = set()
+    covered = set()
+    remaining = budget
+    heap = [(-get_gain(units, covered, duration), index) for index, (units, duration) in enumerate(candidates)]
+    heapq.heapify(heap)
+    while heap:
+        gain, index = heapq.heappop(heap)
+        units, duration = candidates[index]
+        if duration > remaining:
+            continue
+        current = get_gain(units, covered, duration)
+        if current <= 0:
+            continue
+        if current < -gain and heap and -heap[0][0] > current:
+            heapq.heappush(heap, (-current, index))
+            continue
+        selected.add(index)
+        covered.update(units)
+        remaining -= duration
+    return selected, remaining
+
+
+def get_gain(units, covered, duration):
+    new_units = len(units.difference(covered))
+    if not new_units:
+        return 0
+    return new_units / duration if duration > 0 else float('inf')
+
+
+def update_failures(failures, results):
+    """
+    update failed combinations of test function and pairs of fixture ids, which probably cause the failures,
+    pair is suspicious, when it is part of failed combination and no passed combination, when all pairs
+    of failed combination passed elsewhere, all its pairs are suspicious
+
+    failed combination with a suspicious pair from last run does not add pairs, so rerun of only failed
+    combinations (without passed ones) does not widen suspicious pairs
+
+    :param failures: {'combinations': [[fixture id]], 'pairs': [[fixture id, fixture id]]} from last run or None
+    :param results: {tuple of fixture ids of combination: True if failed} of this run
+    :return: updated failures or None when no combination fails
+    """
+    failures = failures or {'combinations': [], 'pairs': []}
+    passed_units = set()
+    for combination, failed in results.items():
+        if not failed:
+            passed_units.update(get_coverage_units(combination))
+    combinations = set(map(tuple, failures['combinations']))
+    combinations.update(combination for combination, failed in results.items() if failed)
+    combinations.difference_update(combination for combination, failed in results.items() if not failed)
+    if not combinations:
+        return None
+    known_pairs = set(map(tuple, failures['pairs'])).difference(passed_units)
+    pairs = set(known_pairs)
+    for combination, failed in results.items():
+        if failed:
+            units = get_coverage_units(combination)
+            if not units.intersection(known_pairs):
+                pairs.update(units.difference(passed_units) or units)
+    return {'combinations': sorted(map(list, combinations)), 'pairs': sorted(map(list, pairs))}
+
+
+class FailureIndex:
+    """
+    fixture ids of failed combinations of one test function and their suspicious pairs, ids (not node ids)
+    are compared, so the index works also after combinations of the test are changed
+    """
+
+    def __init__(self, failures):
+        """
+        :param failures: failed combinations and suspicious pairs (`update_failures`)
+        """
+        self.values = set()
+        for combination in failures['combinations']:
+            self.values.update(combination)
+        self.units = set(map(tuple, failures['pairs']))
+
+    def get_score(self, fixture_ids):
+        """
+        :return: (number of shared suspicious pairs, number of shared failed values)
+        """
+        return len(self.units.intersection(get_coverage_units(fixture_ids))), len(self.values.intersection(fixture_ids))
+
+
+def get_failure_inducing(results, max_size=2):
+    """
+    get_failure_inducing({('a1', 'b1'): True, ('a1', 'b2'): False, ('a2', 'b1'): False}) == [('a1', 'b1')]
+
+    :param results: {tuple of fixture ids of combination: True if failed}
+    :return: minimal tuples of fixture ids (up to `max_size` ids), which are only in failed combinations
+    """
+    counts = defaultdict(lambda: [0, 0])
+    for combination, failed in results.items():
+        fixture_ids = sorted(combination)
+        for size in range(1, min(max_size, len(fixture_ids)) + 1):
+            for ids in itertools.combinations(fixture_ids, size):
+                counts[ids][0 if failed else 1] += 1
+    inducing = {ids for ids, (failed, passed) in counts.items() if failed and not passed}
+    minimal = [ids for ids in inducing
+               if not any(sub in inducing for size in range(1, len(ids)) for sub in itertools.combinations(ids, size))]
+    return sorted(minimal, key=lambda ids: (len(ids), ids))
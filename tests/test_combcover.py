@@ -2,6 +2,7 @@ import pytest
 import re
 
 from pytest_matrix import TestMatrixMixin, exceptions
+from pytest_matrix.mixin import FixtureGrouper, subtract_box
 
 
 @pytest.fixture
@@ -351,3 +352,68 @@ def test_exclude_generated_test_combinations(testdir):
         ('test_fn[y_x]', 'TestOtherTest'),
         ('test_combocover_fn_y', 'TestFirst')
     }
+
+
+def test_difference_without_enumeration():
+    names = ['d%s' % index for index in range(12)]
+    full = {name: ['a', 'b', 'c', 'd'] for name in names}
+    halves = [dict(full, d0=['a', 'b']), dict(full, d0=['c', 'd'])]
+    expected = FixtureGrouper(names, [full])
+
+    assert expected.difference(FixtureGrouper(names, halves)) == set()
+    covered = [dict(full, d0=['a', 'b', 'c']), dict(full, d0=['d'], d1=['a', 'b', 'c']),
+               dict(full, d0=['d'], d1=['d'], d2=['a', 'b', 'c', 'd'])]
+    assert expected.difference(FixtureGrouper(names, covered)) == set()
+
+
+def test_difference_missing():
+    names = ['x', 'y', 'z']
+    expected = FixtureGrouper(names, [{'x': ['a', 'b'], 'y': ['c', 'd'], 'z': ['#1', '#2']}])
+    covered = FixtureGrouper(names, [{'x': ['a'], 'y': ['c', 'd'], 'z': ['#1', '#2']},
+                                     {'x': ['b'], 'y': ['c'], 'z': ['#1']}])
+    assert expected.difference(covered) == {'[1|x_b|y_d]', '[2|x_b|y_c]', '[2|x_b|y_d]'}
+
+
+def test_subtract_box():
+    assert subtract_box((0b11, 0b11), (0b01, 0b01)) == [(0b10, 0b11), (0b01, 0b10)]
+    assert subtract_box((0b11, 0b01), (0b01, 0b10)) == [(0b11, 0b01)]
+    assert subtract_box((0b01, 0b01), (0b11, 0b11)) == []
+
+
+@pytest.mark.parametrize('options, missing', [
+    ({'FN_FIXTURES_STRATEGY': 'pairwise'}, 4),
+    ({'FN_FIXTURES_EXCLUDE': [{'x': ['a'], 'y': ['c']}]}, 2),
+])
+def test_combination_function_options(combination_test_mixin, options, missing):
+    TestMyTest = type('TestMyTest', (combination_test_mixin,), dict(
+        options,
+        FN_FIXTURES=[{'x': ['a', 'b'], 'y': ['c', 'd'], 'z': ['j', 'k']}],
+        FN_FIXTURES_NAMES=['x', 'y', 'z'],
+        FX_FIXTURES=[{'x': ['a']}],
+        COMBINATIONS_COVER=[{"fixture_names": ['x', 'y', 'z'], "fixture_functions": ['fn']}],
+    ))
+    with pytest.raises(AssertionError) as exec_info:
+        TestMyTest().test_combocover_fn_x_y_z()
+    assert len(re.findall(r'\[\w_\w\|\w_\w\|\w_\w\]', exec_info.exconly())) == missing
+
+
+def test_combination_function_options_projected(combination_test_mixin):
+    class TestMyTest(combination_test_mixin):
+        FN_FIXTURES = [{'x': ['a', 'b'], 'y': ['c', 'd'], 'z': ['j', 'k']}]
+        FN_FIXTURES_NAMES = ['x', 'y', 'z']
+        FN_FIXTURES_STRATEGY = 'pairwise'
+        FX_FIXTURES = [{'x': ['a']}]
+
+        COMBINATIONS_COVER = [{"fixture_names": ['x', 'y'], "fixture_functions": ['fn']}]
+
+    assert TestMyTest().test_combocover_fn_x_y() is None
+
+
+def test_combination_function_different_options(combination_test_mixin):
+    with pytest.raises(exceptions.InvalidGrouperOption):
+        class TestMyTest(combination_test_mixin):
+            FN_FIXTURES = [{'x': ['a', 'b'], 'y': ['c', 'd']}]
+            FN_FIXTURES_STRATEGY = 'pairwise'
+            FX_FIXTURES = [{'x': ['a', 'b'], 'y': ['c', 'd']}]
+
+            COMBINATIONS_COVER = [{"fixture_names": ['x', 'y'], "fixture_functions": ['fn', 'fx']}]
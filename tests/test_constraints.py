@@ -0,0 +1,99 @@
+import itertools
+
+import pytest
+
+from pytest_matrix import TestMatrixMixin, exceptions
+from pytest_matrix.mixin import FixtureGrouper
+
+
+COMBS = [{'db': ['sqlite', 'postgres'], 'isolation': ['serializable', 'committed'], 'pool': ['#1', '#2']}]
+
+
+def get_ids(grouper):
+    return [ids for ids, _ in grouper.generate_fixtures_with_ids()]
+
+
+@pytest.mark.parametrize('options, count', [
+    ({'exclude': {'db': ['sqlite'], 'isolation': ['serializable']}}, 6),
+    ({'exclude': [{'db': ['sqlite'], 'isolation': ['serializable']}, {'pool': ['#2']}]}, 3),
+    ({'exclude': lambda db, isolation: db == 'sqlite' and isolation == 'serializable'}, 6),
+    ({'require': {'db': ['postgres']}}, 4),
+    ({'require': lambda db, pool: db == 'postgres' or pool == '#1'}, 6),
+    ({'require': {'db': ['postgres']}, 'exclude': {'pool': ['#1']}}, 2),
+])
+def test_constraints(options, count):
+    grouper = FixtureGrouper(['db', 'isolation', 'pool'], COMBS, **options)
+    ids = get_ids(grouper)
+    assert len(ids) == grouper.count() == count
+    full = FixtureGrouper(['db', 'isolation', 'pool'], COMBS)
+    assert set(ids) <= set(get_ids(full))
+
+
+def test_constraints_prune_product():
+    calls = []
+    grouper = FixtureGrouper(['a', 'b', 'c'], [{name: list('0123456789') for name in 'abc'}],
+                             require=lambda a: calls.append(a) or a == '0')
+    assert len(get_ids(grouper)) == 100
+    assert len(calls) == 10
+
+
+@pytest.mark.parametrize('order, costs', [
+    ('gray', None),
+    ('product', {'c': 2, 'b': 1}),
+])
+def test_constraints_keep_order(order, costs):
+    combs = [{name: ['x', 'y', 'z'] for name in 'abc'}]
+    rule = {'a': ['x'], 'c': ['y']}
+    options = {'order': order, 'costs': costs or {}}
+    expected = [ids for ids in get_ids(FixtureGrouper(['a', 'b', 'c'], combs, **options))
+                if not ('a_x' in ids and 'c_y' in ids)]
+    assert get_ids(FixtureGrouper(['a', 'b', 'c'], combs, exclude=rule, **options)) == expected
+
+
+def test_constraints_pairwise():
+    names = ['a', 'b', 'c', 'd']
+    combs = [{name: ['x', 'y', 'z'] for name in names}]
+    grouper = FixtureGrouper(names, combs, strategy='pairwise', exclude=[{'a': ['x'], 'b': ['y']},
+                                                                         lambda c, d: c == d])
+    rows = [dict(zip(names, fixtures)) for fixtures in grouper.generate_combinations()]
+    assert not any(row['a'] == 'a_x' and row['b'] == 'b_y' for row in rows)
+    assert not any(row['c'][-1] == row['d'][-1] for row in rows)
+    for first, second in itertools.combinations(names, 2):
+        expected = {(first + '_' + x, second + '_' + y) for x, y in itertools.product('xyz', repeat=2)}
+        if (first, second) == ('a', 'b'):
+            expected.discard(('a_x', 'b_y'))
+        if (first, second) == ('c', 'd'):
+            expected = {(c, d) for c, d in expected if c[-1] != d[-1]}
+        assert {(row[first], row[second]) for row in rows} == expected
+
+
+@pytest.mark.parametrize('options', [
+    {'FN_FIXTURES_EXCLUDE': 'x'},
+    {'FN_FIXTURES_EXCLUDE': {'y': ['x']}},
+    {'FN_FIXTURES_REQUIRE': [lambda y: True]},
+    {'FN_FIXTURES_REQUIRE': {'x': 'x'}},
+])
+def test_invalid_constraints(options):
+    with pytest.raises(exceptions.InvalidFixturesOption):
+        type('Test', (TestMatrixMixin,), dict(options, FN_FIXTURES=[{'x': ['x']}], test_fn=lambda self: None))
+
+
+def test_constraints_marker(testdir):
+    testdir.makepyfile("""
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    @pytest.mark.matrix(names=['a', 'b'], combs=[{'a': ['#1', '#2'], 'b': ['#1', '#2']}],
+                        exclude=lambda a, b: a == b)
+    def test_marker(a, b):
+        assert a != b
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{'a': ['#1', '#2'], 'b': ['#1', '#2']}]
+        FN_FIXTURES_REQUIRE = {'a': ['#2']}
+
+        def test_fn(self, a, b):
+            assert a == 2
+    """)
+    result = testdir.runpytest()
+    result.assert_outcomes(passed=4)
@@ -0,0 +1,54 @@
+import json
+
+from pytest_matrix.cover_report import CoverReport
+from pytest_matrix.mixin import FixtureGrouper
+
+
+def test_cover_report():
+    report = CoverReport()
+    first = FixtureGrouper(['db', 'cache'], [{'db': ['postgres', 'mysql'], 'cache': ['redis']}])
+    second = FixtureGrouper(['cache', 'db'], [{'db': ['postgres', 'sqlite'], 'cache': ['redis', '#1']}])
+    report.add('test_first', first.fixture_names, first.get_plan())
+    report.add('test_second', second.fixture_names, second.get_plan())
+    data = report.get_data()
+    assert data['tests'] == {'test_first': 2, 'test_second': 4}
+    assert data['dimensions'] == {'cache': {'#1': 2, 'redis': 4},
+                                  'db': {'mysql': 1, 'postgres': 3, 'sqlite': 2}}
+    assert data['pairs'] == [{
+        'fixtures': ['cache', 'db'],
+        'covered': 5,
+        'total': 6,
+        'missing': [['#1', 'mysql']],
+        'counts': [['#1', 'postgres', 1], ['#1', 'sqlite', 1], ['redis', 'mysql', 1], ['redis', 'postgres', 2],
+                   ['redis', 'sqlite', 1]],
+    }]
+    assert data['redundant'] == [{'combination': {'cache': 'redis', 'db': 'postgres'}, 'count': 2,
+                                  'tests': ['test_first', 'test_second']}]
+
+
+def test_cover_report_option(testdir):
+    testdir.makepyfile("""
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{'a': ['#1', '#2'], 'b': ['#3']}]
+
+        def test_fn(self, a, b):
+            pass
+
+    @pytest.mark.matrix(names=['a'], combs=[{'a': ['#1', '#4']}])
+    def test_marker(a):
+        pass
+    """)
+    json_path = testdir.tmpdir.join('cover.json')
+    result = testdir.runpytest('--matrix-cover-report', str(json_path))
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines(['matrix cover report: *cover.json'])
+    data = json.loads(json_path.read())
+    assert data['dimensions'] == {'a': {'#1': 2, '#2': 1, '#4': 1}, 'b': {'#3': 2}}
+    assert data['pairs'][0]['missing'] == [['#4', '#3']]
+
+    html_path = testdir.tmpdir.join('cover.html')
+    testdir.runpytest('--collect-only', '--matrix-cover-report', str(html_path))
+    assert '<h3>a / b: 2 of 3 pairs</h3>' in html_path.read()
@@ -0,0 +1,41 @@
+import itertools
+
+import pytest
+
+from pytest_matrix.covering import covering_array
+
+
+def assert_covered(rows, radices, strength):
+    for cols in itertools.combinations(range(len(radices)), strength):
+        expected = set(itertools.product(*(range(radices[c]) for c in cols)))
+        assert expected == {tuple(row[c] for c in cols) for row in rows}
+
+
+@pytest.mark.parametrize('radices, strength', [
+    ([2, 2, 2], 2),
+    ([3, 3, 3, 3], 2),
+    ([2, 5, 3, 4, 2], 2),
+    ([3, 3, 3, 3, 3], 3),
+    ([4, 1, 3], 2),
+])
+def test_covering_array(radices, strength):
+    rows = covering_array(radices, strength)
+    assert_covered(rows, radices, strength)
+    assert all(len(row) == len(radices) for row in rows)
+    assert len(rows) <= len(list(itertools.product(*map(range, radices))))
+
+
+def test_covering_array_strength_greater_than_columns():
+    assert covering_array([2, 2], 3) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+
+
+def test_covering_array_empty():
+    assert covering_array([2, 0, 2], 2) == []
+    assert covering_array([], 2) == []
+
+
+def test_covering_array_pairwise_size():
+    rows = covering_array([3] * 4, 2)
+    assert len(rows) <= 11
+    rows = covering_array([2] * 10, 2)
+    assert len(rows) <= 12
@@ -1,7 +1,13 @@
+import json
+
 import pytest
 import re
+import tracemalloc
 
 from pytest_matrix import TestMatrixMixin, exceptions
+from pytest_matrix.batching import ParameterSets, get_batches
+from pytest_matrix.mixin import FixtureGrouper
+from pytest_matrix.profiling import MatrixProfiler
 
 
 def test_generate(testdir):
@@ -364,3 +370,720 @@ def test_simple_fixture_generator_function(testdir, variable, result):
     result = testdir.runpytest(str(path))
 
     result.assert_outcomes(skipped=0, failed=0, passed=4)
+
+
+def test_generate_pairwise(testdir):
+    source = """
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    COMBS = [{
+        'a': ['@1', '@2', '@3'],
+        'b': ['@1', '@2', '@3'],
+        'c': ['@1', '@2', '@3'],
+        'd': ['@1', '@2', '@3'],
+    }]
+
+    @pytest.mark.matrix(names=['a', 'b', 'c', 'd'], combs=COMBS, strategy='pairwise')
+    def test_marker(a, b, c, d):
+        pass
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = COMBS
+        FN_FIXTURES_STRENGTH = 3
+
+        def test_fn(self, a, b, c, d):
+            pass
+    """
+    testdir.makepyfile(source)
+    items = testdir.getitems(source)
+    marker_items = [item for item in items if item.originalname == 'test_marker']
+    class_items = [item for item in items if item.originalname == 'test_fn']
+    assert 9 <= len(marker_items) < 3 ** 4
+    assert 27 <= len(class_items) < 3 ** 4
+
+    for names in (('a', 'b'), ('b', 'd'), ('c', 'd')):
+        pairs = {tuple(item.callspec.params[name] for name in names) for item in marker_items}
+        assert len(pairs) == 9
+
+
+@pytest.mark.parametrize('options', [
+    {'FN_FIXTURES_STRATEGY': 'unknown'},
+    {'FN_FIXTURES_STRENGTH': 0},
+    {'FN_FIXTURES_STRATEGY': 'pairwise', 'FN_FIXTURES_STRENGTH': 3},
+    {'FN_FIXTURES_DEDUPE': 'no'},
+    {'FN_FIXTURES_CACHE': {'x': 0}},
+    {'FN_FIXTURES_CACHE': {'y': 1}},
+    {'FN_FIXTURES_CONCURRENT': -1},
+    {'FN_FIXTURES_BATCH': 'all'},
+])
+def test_invalid_fixtures_options(options):
+    with pytest.raises(exceptions.InvalidFixturesOption):
+        type('Test', (TestMatrixMixin,), dict(options, FN_FIXTURES=[{'x': ['x']}], test_fn=lambda self: None))
+
+
+def test_invalid_marker_options(testdir):
+    testdir.makepyfile("""
+    import pytest
+
+    @pytest.mark.matrix(names=['a'], combs=[{'a': ['#1', '#2']}], strenght=3)
+    def test_marker(a):
+        pass
+    """)
+    result = testdir.runpytest()
+    result.assert_outcomes(error=1)
+    result.stdout.fnmatch_lines(["*Invalid matrix option 'strenght': unknown option*"])
+
+
+def test_parametrize_data_shares_fixtures():
+    grouper = FixtureGrouper(['a', 'b'], [{'a': ['x', 'y'], 'b': ['#1', 'z']}])
+    data = grouper.get_parametrize_data(['a', 'b'])
+    assert 'ids' not in data
+    parameter_sets = list(data['argvalues'])
+    assert [parameter_set.id for parameter_set in parameter_sets] == ['1|a_x', 'a_x|b_z', '1|a_y', 'a_y|b_z']
+    assert parameter_sets[0].values[0] is parameter_sets[1].values[0]
+    assert parameter_sets[1].values[1] is parameter_sets[3].values[1]
+    assert parameter_sets[0].values[1] == 1
+
+
+def test_count():
+    grouper = FixtureGrouper(['a', 'b', 'c'], [{'a': ['x', 'y'], 'b': ['x', 'y', 'z'], 'c': ['x'] * 100},
+                                               {'a': ['x'], 'b': ['y'], 'c': ['z']}])
+    assert grouper.count() == 601
+    assert FixtureGrouper(['a'], []).count() == 0
+    grouper = FixtureGrouper(['a', 'b', 'c'], [{name: ['x', 'y', 'z'] for name in 'abc'}], strategy='pairwise')
+    assert grouper.count() == len(list(grouper.generate_fixtures_with_ids()))
+
+
+@pytest.mark.parametrize('options, count', [
+    ({}, 7),
+    ({'dedupe': False}, 10),
+    ({'strategy': 'pairwise'}, 7),
+])
+def test_dedupe(options, count):
+    combs = [{'a': ['x', 'y'], 'b': ['x', 'y'], 'c': ['x']},
+             {'a': ['y', 'z'], 'b': ['y'], 'c': ['x']},
+             {'a': ['x'], 'b': ['x', 'y'], 'c': ['x', 'y']}]
+    grouper = FixtureGrouper(['a', 'b', 'c'], combs, **options)
+    ids = [comb_ids for comb_ids, _ in grouper.generate_fixtures_with_ids()]
+    assert len(ids) == grouper.count() == count
+    assert len(set(ids)) == 7
+    assert grouper.get_plan()['ids'] == ids
+
+
+@pytest.mark.parametrize('args, outcomes', [
+    ([], {'passed': 11}),
+    (['--matrix-max-items=4'], {'error': 1}),
+    (['--matrix-max-items=4', '--matrix-budget=warn'], {'passed': 11}),
+    (['--matrix-max-session-items=5'], {'error': 1}),
+])
+def test_budget(testdir, args, outcomes):
+    testdir.makepyfile(test_first="""
+    import pytest
+
+    @pytest.mark.matrix(names=['a'], combs=[{'a': ['#1', '#2', '#3']}])
+    def test_fn(a):
+        pass
+    """, test_second="""
+    import pytest
+
+    @pytest.mark.matrix(names=['a', 'b'], combs=[{'a': ['#1'], 'b': ['#1', '#2', '#3']}])
+    def test_fn(a, b):
+        pass
+
+    @pytest.mark.matrix(names=['a'], combs=[{'a': ['#1', '#2', '#3', '#4', '#5']}])
+    def test_big(a):
+        pass
+    """)
+    result = testdir.runpytest(*args)
+    result.assert_outcomes(**outcomes)
+
+
+def test_plan_cache(testdir, monkeypatch):
+    testdir.makepyfile("""
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{'a': ['#1', '#2'], 'b': ['x', 'y']}]
+
+        def test_fn(self, a, b):
+            assert a in (1, 2)
+            assert b in ('x', 'y')
+
+        @pytest.fixture
+        def b_x(self):
+            return 'x'
+
+        @pytest.fixture
+        def b_y(self):
+            return 'y'
+    """)
+    result = testdir.runpytest('--matrix-plan-cache', '-v')
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines(['*test_fn?1|b_x?*'])
+
+    def generate_symbol_combinations(self, fixture_names=None):
+        raise AssertionError('plan is not loaded from cache')
+
+    monkeypatch.setattr(FixtureGrouper, 'generate_symbol_combinations', generate_symbol_combinations)
+    result = testdir.runpytest('--matrix-plan-cache', '-v')
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines(['*test_fn?1|b_x?*'])
+    result = testdir.runpytest('-v')
+    result.assert_outcomes(error=1)
+
+
+@pytest.mark.parametrize('combs, ids', [
+    ([{'b': ['x', 'y'], 'a': ['z']}], ['a_z|b_x', 'a_z|b_y']),
+    ([{'b': ['#1', '#3'], 'a': ['#2']}], ['1|2', '2|3']),
+])
+def test_ids_are_sorted(combs, ids):
+    grouper = FixtureGrouper(['b', 'a'], combs)
+    assert [comb_ids for comb_ids, _ in grouper.generate_fixtures_with_ids()] == ids
+    assert grouper.get_plan()['ids'] == ids
+
+
+def test_fixture_name_parsed_once(monkeypatch):
+    grouper = FixtureGrouper(['a', 'b', 'c'], [{name: ['x', 'y', 'z'] for name in 'abc'}] * 2, dedupe=False)
+    parsed = []
+    create_fixture_for_name = grouper.create_fixture_for_name
+    monkeypatch.setattr(grouper, 'create_fixture_for_name', lambda name: parsed.append(name)
+                        or create_fixture_for_name(name))
+    assert len(list(grouper.generate_fixtures_with_ids())) == 54
+    assert len(parsed) == 9
+
+
+def test_test_names_index():
+    class Helpers:
+        def test_helper(self):
+            pass
+
+    class TestMixin(TestMatrixMixin, Helpers):
+        IS_MIXIN = True
+        SKIP_TESTS = ['test_fn']
+
+        def test_fn(self):
+            pass
+
+    base = TestMixin
+    for depth in range(300):
+        base = type('TestMixin%s' % depth, (base,), {'IS_MIXIN': True, 'test_%s' % depth: lambda self: None})
+
+    class Test(base):
+        NOT_GENERATE_TESTS = ['test_%s' % depth for depth in range(300)]
+        FN_FIXTURES = HELPER_FIXTURES = [{'x': ['x']}]
+
+    assert Test._matrix_test_names == {'test_fn', 'test_helper'} | {'test_%s' % depth for depth in range(300)}
+    assert Test.get_cleaned_test_names() == ['fn', 'helper']
+    assert TestMixin.should_be_parametrize('test_fn') is False
+    with pytest.raises(exceptions.FixturesCombinationsMissing):
+        type('Test', (base,), {'FN_FIXTURES': [{'x': ['x']}]})
+
+
+def test_profile(testdir):
+    testdir.makepyfile("""
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{'a': ['#1', '#2'], 'b': ['#3', '#4', '#5']}]
+
+        def test_fn(self, a, b):
+            pass
+
+    @pytest.mark.matrix(names=['a'], combs=[{'a': ['#1', '#2']}])
+    def test_marker(a):
+        pass
+    """)
+    json_path = testdir.tmpdir.join('profile.json')
+    result = testdir.runpytest('--matrix-profile', '--matrix-profile-json', str(json_path))
+    result.assert_outcomes(passed=8)
+    result.stdout.fnmatch_lines(['*matrix profile*', 'section*calls*time*combinations*id bytes*memory*name'])
+    records = {(record['section'], record['name']): record for record in json.loads(json_path.read())}
+    assert records['parametrize', 'test_profile.py::TestSuite::test_fn']['combinations'] == 6
+    assert records['parametrize', 'test_profile.py::TestSuite::test_fn']['id_bytes'] == 6 * 3
+    assert records['parametrize', 'test_profile.py::test_marker']['combinations'] == 2
+    assert records['generate', 'test_profile.py::test_marker']['calls'] == 1
+    assert records['class', 'test_profile.TestSuite']['calls'] == 1
+
+
+def test_profile_not_tracing_tests(testdir):
+    testdir.makepyfile("""
+    import tracemalloc
+    import pytest
+
+    @pytest.mark.matrix(names=['a'], combs=[{'a': ['#1', '#2']}])
+    def test_marker(a):
+        assert not tracemalloc.is_tracing()
+    """)
+    testdir.runpytest('--matrix-profile').assert_outcomes(passed=2)
+
+
+@pytest.mark.skipif(not hasattr(tracemalloc, 'reset_peak'), reason="peak of memory needs python >= 3.9")
+def test_profile_nested_peak():
+    profiler = MatrixProfiler()
+    profiler.enable()
+    try:
+        with profiler.measure('generate', 'test_fn') as outer:
+            data = bytearray(10 ** 6)
+            del data
+            with profiler.measure('parametrize', 'test_fn') as inner:
+                pass
+    finally:
+        profiler.disable()
+    assert outer['memory'] >= 10 ** 6 > inner['memory']
+
+
+def test_lazy_fixtures_bound_at_collection(testdir):
+    testdir.makeconftest("""
+    lookups = []
+
+    def pytest_collection_finish(session):
+        getfixturedefs = session._fixturemanager.getfixturedefs
+        session._fixturemanager.getfixturedefs = lambda name, nodeid: lookups.append(name) or getfixturedefs(
+            name, nodeid)
+    """)
+    testdir.makepyfile("""
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+    from conftest import lookups
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{'a': ['x', 'y'], 'b': ['x', 'y']}]
+
+        def test_fn(self, a, b):
+            assert a in ('x', 'y') and b == 'b'
+
+        @pytest.fixture
+        def base(self):
+            return 'x'
+
+        @pytest.fixture
+        def a_x(self, base):
+            return base
+
+        @pytest.fixture
+        def a_y(self):
+            return 'y'
+
+        @pytest.fixture
+        def b_x(self):
+            return 'b'
+
+        @pytest.fixture
+        def b_y(self):
+            return 'b'
+
+    def test_lookups():
+        assert set(lookups) <= {'request'}
+    """)
+    result = testdir.runpytest('-p', 'no:randomly')
+    result.assert_outcomes(passed=5)
+
+
+@pytest.mark.parametrize('source, registered', [
+    ("""
+    def test_plain():
+        pass
+    """, False),
+    ("""
+    import pytest
+
+    @pytest.mark.matrix(names=['a'], combs=[{'a': ['#1']}])
+    def test_marker(a):
+        pass
+    """, True),
+    ("""
+    from pytest_matrix import TestMatrixMixin
+
+    class TestSuite(TestMatrixMixin):
+        SKIP_TESTS = ['test_fn']
+
+        def test_fn(self):
+            pass
+    """, True),
+])
+def test_items_plugin_registered_lazily(testdir, source, registered):
+    testdir.makepyfile(source)
+    config = testdir.inline_run().getcalls('pytest_unconfigure')[0].config
+    assert config.pluginmanager.has_plugin('matrix_items') is registered
+
+
+@pytest.mark.parametrize('cache, events', [
+    (None, ['a', '-a', 'b', '-b'] * 3),
+    ({'backend': None}, ['a', 'b']),
+    ({'backend': 2}, ['a', 'b']),
+    ({'backend': 1}, ['a', '-a', 'b', '-b', 'a', '-a', 'b', '-b', 'a', '-a', 'b']),
+])
+def test_fixture_cache(testdir, cache, events):
+    testdir.makepyfile("""
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    events = []
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{{'x': ['#1', '#2', '#3'], 'backend': ['a', 'b']}}]
+        FN_FIXTURES_NAMES = ['x', 'backend']
+        FN_FIXTURES_CACHE = {cache!r} or {{}}
+
+        def test_fn(self, x, backend):
+            assert backend in ('a', 'b')
+
+        @pytest.fixture
+        def backend_a(self):
+            events.append('a')
+            yield 'a'
+            events.append('-a')
+
+        @pytest.fixture
+        def backend_b(self):
+            events.append('b')
+            yield 'b'
+            events.append('-b')
+
+    def test_events():
+        assert events == {events!r}
+    """.format(cache=cache, events=events))
+    result = testdir.runpytest('-p', 'no:randomly')
+    result.assert_outcomes(passed=7)
+
+
+def test_fixture_cache_per_test(testdir):
+    testdir.makepyfile("""
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    events = []
+
+    class Base(TestMatrixMixin):
+        IS_MIXIN = True
+
+        def test_fn(self, x, backend):
+            pass
+
+        @pytest.fixture
+        def backend_a(self):
+            events.append(type(self).__name__ + ' a')
+            return 'a'
+
+        @pytest.fixture
+        def backend_b(self):
+            events.append(type(self).__name__ + ' b')
+            return 'b'
+
+    class TestA(Base):
+        FN_FIXTURES = [{'x': ['#1', '#2'], 'backend': ['a', 'b']}]
+        FN_FIXTURES_NAMES = ['x', 'backend']
+        FN_FIXTURES_CACHE = {'backend': None}
+
+    class TestB(Base):
+        FN_FIXTURES = [{'x': ['#1', '#2'], 'backend': ['a', 'b']}]
+        FN_FIXTURES_NAMES = ['x', 'backend']
+        FN_FIXTURES_CACHE = {'backend': 1}
+
+    def test_events():
+        assert events == ['TestA a', 'TestA b', 'TestB a', 'TestB b', 'TestB a', 'TestB b']
+    """)
+    testdir.runpytest('-p', 'no:randomly').assert_outcomes(passed=9)
+
+
+def test_fixture_cache_not_shared(testdir):
+    testdir.makepyfile("""
+    import pytest
+
+    events = []
+
+    @pytest.fixture
+    def backend_pg():
+        events.append('pg')
+        yield 'pg'
+        events.append('-pg')
+
+    @pytest.mark.matrix(names=['x', 'backend'], combs=[{'x': ['#1', '#2'], 'backend': ['pg']}], cache={'backend': 1})
+    def test_fn(x, backend):
+        pass
+
+    def test_plain(backend_pg):
+        pass
+
+    def test_plain_again(backend_pg):
+        pass
+
+    def test_events():
+        assert events == ['pg', 'pg', '-pg', 'pg', '-pg']
+    """)
+    testdir.runpytest('-p', 'no:randomly').assert_outcomes(passed=5)
+
+
+def test_fixture_cache_scope(testdir):
+    testdir.makepyfile("""
+    import pytest
+
+    @pytest.fixture
+    def backend_pg(tmp_path):
+        return 'pg'
+
+    @pytest.mark.matrix(names=['backend'], combs=[{'backend': ['pg']}], cache={'backend': 1})
+    def test_fn(backend):
+        pass
+
+    def test_plain(backend_pg):
+        pass
+    """)
+    result = testdir.runpytest()
+    result.assert_outcomes(error=1)
+    result.stdout.fnmatch_lines(["*Invalid matrix option 'cache': cached value 'backend_pg' depends on fixture "
+                                 "'tmp_path' with scope 'function'*"])
+
+
+@pytest.mark.parametrize('concurrent, outcomes', [
+    (False, {'error': 2, 'passed': 1}),
+    (True, {'passed': 3}),
+])
+def test_concurrent_fixtures(testdir, concurrent, outcomes):
+    testdir.makepyfile("""
+    import threading
+
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    events = []
+    barrier = threading.Barrier(2, timeout=1)
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{{'db': ['postgres', 'mysql'], 'cache': ['redis']}}]
+        FN_FIXTURES_CONCURRENT = {concurrent!r}
+
+        def test_fn(self, db, cache):
+            assert events[0] == 'base'
+            assert cache == 'redis'
+
+        @pytest.fixture
+        def base(self):
+            events.append('base')
+            yield 'base'
+            events.append('-base')
+
+        @pytest.fixture
+        def db_postgres(self, base):
+            barrier.wait()
+            events.append('postgres')
+            yield 'postgres'
+            events.append('-postgres')
+
+        @pytest.fixture
+        def db_mysql(self, base):
+            barrier.wait()
+            events.append('mysql')
+            yield 'mysql'
+            events.append('-mysql')
+
+        @pytest.fixture
+        def cache_redis(self):
+            barrier.wait()
+            events.append('redis')
+            yield 'redis'
+            events.append('-redis')
+
+    def test_events():
+        if {concurrent!r}:
+            assert events[0] == 'base'
+            assert set(events[1:3]) == {{'postgres', 'redis'}}
+            assert set(events[3:5]) == {{'-postgres', '-redis'}}
+            assert events[5] == '-base'
+    """.format(concurrent=concurrent))
+    result = testdir.runpytest('-p', 'no:randomly')
+    result.assert_outcomes(**outcomes)
+
+
+def test_fork(testdir):
+    testdir.makepyfile("""
+    import os
+
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    PARENT = os.getpid()
+    state = []
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{'db': ['postgres', 'mysql'], 'x': ['#1', '#2']}]
+
+        def test_fn(self, db, x, shared):
+            assert os.getpid() != PARENT
+            assert state == []
+            state.append(x)
+            if x == 2 and db == 'mysql':
+                os._exit(3)
+
+        @pytest.fixture(scope='class')
+        def shared(self):
+            with open('events.txt', 'a') as f:
+                f.write('shared %s\\n' % (os.getpid() == PARENT))
+            yield
+            with open('events.txt', 'a') as f:
+                f.write('-shared %s\\n' % (os.getpid() == PARENT))
+
+        @pytest.fixture
+        def db_postgres(self):
+            return 'postgres'
+
+        @pytest.fixture
+        def db_mysql(self):
+            return 'mysql'
+
+    def test_other():
+        assert os.getpid() == PARENT
+    """)
+    result = testdir.runpytest('--matrix-fork')
+    result.assert_outcomes(passed=4, failed=1)
+    result.stdout.fnmatch_lines(['*forked test process crashed with exit code 3*'])
+    assert testdir.tmpdir.join('events.txt').read().splitlines() == ['shared True', '-shared True']
+
+
+def test_fork_warms_fixtures_of_values(testdir):
+    testdir.makepyfile("""
+    import os
+
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    PARENT = os.getpid()
+
+    @pytest.fixture(scope='session')
+    def engine():
+        with open('events.txt', 'a') as f:
+            f.write('engine %s\\n' % (os.getpid() == PARENT))
+        yield 'engine'
+        with open('events.txt', 'a') as f:
+            f.write('-engine %s\\n' % (os.getpid() == PARENT))
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{'db': ['a', 'b', 'c']}]
+
+        def test_fn(self, db):
+            assert db == 'engine'
+
+        @pytest.fixture
+        def db_a(self, engine):
+            return engine
+
+        @pytest.fixture
+        def db_b(self, engine):
+            return engine
+
+        @pytest.fixture
+        def db_c(self, engine):
+            return engine
+    """)
+    testdir.runpytest('--matrix-fork').assert_outcomes(passed=3)
+    assert testdir.tmpdir.join('events.txt').read().splitlines() == ['engine True', '-engine True']
+
+
+def test_fork_skipped_shared_fixture(testdir):
+    testdir.makepyfile("""
+    import pytest
+
+    @pytest.fixture(scope='module')
+    def service():
+        pytest.skip('service not available')
+
+    @pytest.mark.matrix(names=['x'], combs=[{'x': ['#1', '#2']}])
+    def test_fn(service, x):
+        pass
+    """)
+    testdir.runpytest('--matrix-fork').assert_outcomes(skipped=2)
+
+
+@pytest.mark.parametrize('batch, items', [
+    (True, ['test_fn[batch0]']),
+    (4, ['test_fn[batch0]', 'test_fn[batch1]']),
+])
+def test_batch(testdir, batch, items):
+    testdir.makepyfile("""
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{{'db': ['postgres', 'mysql'], 'x': ['#1', '#2'], 'y': ['#3', '#4']}}]
+        FN_FIXTURES_BATCH = {batch!r}
+
+        def test_fn(self, db, x, y, result):
+            if x == 2 and db == 'mysql':
+                pytest.skip()
+            assert result != 'postgres-2-4'
+
+        @pytest.fixture
+        def result(self, db, x, y):
+            return '{{}}-{{}}-{{}}'.format(db, x, y)
+
+        @pytest.fixture
+        def db_postgres(self):
+            return 'postgres'
+
+        @pytest.fixture
+        def db_mysql(self):
+            return 'mysql'
+    """.format(batch=batch))
+    result = testdir.runpytest('--collect-only', '-q')
+    assert [line for line in result.stdout.lines if '::' in line] == ['test_batch.py::TestSuite::' + item
+                                                                      for item in items]
+    result = testdir.runpytest('-rfs', '-v')
+    result.assert_outcomes(passed=len(items), failed=1, skipped=2)
+    result.stdout.fnmatch_lines(['FAILED *::TestSuite::test_fn?2|4|db_postgres? - AssertionError*'])
+    progress = [int(percent) for percent in re.findall(r'\[\s*(\d+)%\]', result.stdout.str())]
+    assert max(progress) == progress[-1] == 100
+    result = testdir.runpytest('-x')
+    result.stdout.fnmatch_lines(['*stopping after 1 failures*'])
+
+
+def test_batch_parameter_sets():
+    calls = []
+
+    def generate():
+        calls.append(None)
+        return iter(range(10))
+    parameter_sets = ParameterSets(generate)
+    batches = get_batches(10, 4)
+    assert [list(batch.get_parameter_sets(parameter_sets)) for batch in batches] == [
+        [0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert len(calls) == 1
+    assert list(batches[1].get_parameter_sets(parameter_sets)) == [4, 5, 6, 7]
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize('args, outcomes', [
+    ((), dict(passed=2, error=4)),
+    (('--matrix-failfast-values',), dict(passed=2, error=2, skipped=2)),
+    (('--matrix-failfast-values', '--matrix-fork'), dict(passed=2, error=2, skipped=2)),
+])
+def test_failfast_values(testdir, args, outcomes):
+    testdir.makepyfile("""
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{'db': ['postgres', 'mysql'], 'x': ['#1', '#2', '#3']}]
+
+        def test_fn(self, db, x, broken):
+            pass
+
+        @pytest.fixture
+        def broken(self, x):
+            if x == 3:
+                raise RuntimeError('broken')
+
+        @pytest.fixture
+        def db_postgres(self):
+            return 'postgres'
+
+        @pytest.fixture
+        def db_mysql(self):
+            raise RuntimeError('mysql is down')
+    """)
+    result = testdir.runpytest(*args)
+    result.assert_outcomes(**outcomes)
+    if '--matrix-failfast-values' in args:
+        result.stdout.fnmatch_lines(["matrix failfast: 1 fixture values failed in setup, skipped 2 tests: db_mysql"])
@@ -0,0 +1,114 @@
+import itertools
+import random
+
+import pytest
+
+from pytest_matrix.mixin import FixtureGrouper
+from pytest_matrix.ordering import get_costs_permutation, get_order_key, ordered_product, pruned_product
+
+
+def test_costs_permutation():
+    assert get_costs_permutation(['a', 'b', 'c'], None) == [0, 1, 2]
+    assert get_costs_permutation(['a', 'b', 'c'], {'c': 10, 'b': 1}) == [2, 1, 0]
+
+
+def assert_gray(rows, radices):
+    assert sorted(rows) == list(itertools.product(*(range(radix) for radix in radices)))
+    for previous, row in zip(rows, rows[1:]):
+        assert sum(a != b for a, b in zip(previous, row)) == 1
+
+
+@pytest.mark.parametrize('radices', [[2, 3, 2], [2, 2, 2], [3, 2, 1, 3], [4, 2, 3]])
+def test_reflected_product(radices):
+    permutation = list(range(len(radices)))
+    rows = list(ordered_product(radices, permutation, reflected=True))
+    assert_gray(rows, radices)
+    assert list(pruned_product(radices, permutation, reflected=True)) == rows
+    assert sorted(rows, key=get_order_key(radices, permutation, True)) == rows
+
+
+def test_reflected_product_random():
+    rng = random.Random(0)
+    for _ in range(200):
+        radices = [rng.randint(1, 4) for _ in range(rng.randint(1, 5))]
+        permutation = rng.sample(range(len(radices)), len(radices))
+        rows = list(ordered_product(radices, permutation, reflected=True))
+        assert_gray(rows, radices)
+        assert list(pruned_product(radices, permutation, reflected=True)) == rows
+        assert sorted(rows, key=get_order_key(radices, permutation, True)) == rows
+
+
+def test_order_key():
+    radices = [3, 2, 4]
+    for permutation, reflected in itertools.product(itertools.permutations(range(3)), (False, True)):
+        rows = list(ordered_product(radices, permutation, reflected))
+        assert sorted(rows, key=get_order_key(radices, permutation, reflected)) == rows
+
+
+def test_generate_ordered_by_costs():
+    grouper = FixtureGrouper(['a', 'b'], [{'a': ['x', 'y'], 'b': ['x', 'y', 'z']}],
+                             order='gray', costs={'b': 5})
+    assert list(grouper.generate_combinations()) == [
+        ('a_x', 'b_x'), ('a_y', 'b_x'), ('a_y', 'b_y'), ('a_x', 'b_y'), ('a_x', 'b_z'), ('a_y', 'b_z'),
+    ]
+
+
+def test_generate_pairwise_ordered():
+    names = ['a', 'b', 'c', 'd']
+    group = {name: ['x', 'y', 'z'] for name in names}
+    combinations = list(FixtureGrouper(names, [group], strategy='pairwise', costs={'d': 1}).generate_combinations())
+    assert [comb[3] for comb in combinations] == sorted(comb[3] for comb in combinations)
+
+
+def test_sort_items_by_costs(testdir):
+    testdir.makepyfile("""
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{'db': ['@a', '@b'], 'x': ['#1', '#2']}]
+        FN_FIXTURES_COSTS = {'db': 10}
+        FX_FIXTURES = [{'db': ['@a', '@b']}]
+
+        def test_fn(self, db, x):
+            pass
+
+        def test_fx(self, db):
+            pass
+    """)
+    result = testdir.runpytest('--collect-only', '-q')
+    result.stdout.fnmatch_lines([
+        '*::test_fn[[]1|a[]]', '*::test_fn[[]2|a[]]', '*::test_fx[[]a[]]',
+        '*::test_fn[[]1|b[]]', '*::test_fn[[]2|b[]]', '*::test_fx[[]b[]]',
+    ])
+
+
+def test_sort_items_by_costs_keeps_other_items(testdir):
+    testdir.makepyfile("""
+    import pytest
+
+    def test_first_plain():
+        pass
+
+    @pytest.mark.matrix(names=['db', 'x'], combs=[{'db': ['@a', '@b'], 'x': ['#1', '#2']}], costs={'db': 10})
+    def test_fn(db, x):
+        pass
+
+    def test_middle_plain():
+        pass
+
+    @pytest.mark.matrix(names=['db'], combs=[{'db': ['@a', '@b']}])
+    def test_fx(db):
+        pass
+
+    def test_last_plain():
+        pass
+    """)
+    result = testdir.runpytest('--collect-only', '-q')
+    result.stdout.fnmatch_lines([
+        '*::test_first_plain',
+        '*::test_fn[[]1|a[]]', '*::test_fn[[]2|a[]]', '*::test_fx[[]a[]]', '*::test_fn[[]1|b[]]',
+        '*::test_middle_plain',
+        '*::test_fn[[]2|b[]]', '*::test_fx[[]b[]]',
+        '*::test_last_plain',
+    ])
@@ -0,0 +1,94 @@
+import itertools
+import random
+
+import pytest
+
+from pytest_matrix.mixin import FixtureGrouper
+from pytest_matrix.sampling import BoxSpace, get_sample_size, parse_sample_size, sample
+
+
+@pytest.mark.parametrize('value, size', [
+    ('10', 10),
+    ('0.5', 0.5),
+    ('1.0', 1.0),
+])
+def test_parse_sample_size(value, size):
+    assert parse_sample_size(value) == size
+
+
+@pytest.mark.parametrize('value', ['0', '-1', '1.5', 'x'])
+def test_parse_invalid_sample_size(value):
+    with pytest.raises(ValueError):
+        parse_sample_size(value)
+
+
+def test_get_sample_size():
+    assert get_sample_size(10, 5) == 5
+    assert get_sample_size(0.1, 55) == 6
+
+
+def test_box_space():
+    boxes = [[[0, 1], [2, 3, 4]], [[5], [2, 6]]]
+    space = BoxSpace(boxes)
+    rows = [row for box in boxes for row in itertools.product(*box)]
+    assert space.total == 8
+    assert [space.get_row(index) for index in range(space.total)] == rows
+    assert space.values == [{0, 1, 5}, {2, 3, 4, 6}]
+
+
+def test_sample_covers_all_values():
+    space = BoxSpace([[list(range(10)), list(range(10, 30)), list(range(30, 35))]])
+    indexes = sample(space, 3, random.Random(1))
+    rows = [space.get_row(index) for index in indexes]
+    assert indexes == sorted(set(indexes))
+    for dimension, values in enumerate(space.values):
+        assert {row[dimension] for row in rows} == values
+    assert len(sample(space, 500, random.Random(1))) == 500
+
+
+def test_sample_huge_space():
+    space = BoxSpace([[list(range(100))] * 10])
+    indexes = sample(space, 200, random.Random(1))
+    assert len(indexes) == 200
+    assert space.total == 100 ** 10
+
+
+@pytest.mark.parametrize('options', [{}, {'strategy': 'pairwise'}, {'exclude': {'a': ['x'], 'b': ['y']}}])
+def test_grouper_sample_plan(options):
+    combs = [{'a': ['x', 'y', 'z'], 'b': ['x', 'y', 'z'], 'c': ['x', 'y']},
+             {'a': ['x', 'w'], 'b': ['y'], 'c': ['x', 'y']}]
+    grouper = FixtureGrouper(['a', 'b', 'c'], combs, **options)
+    all_ids = [ids for ids, _ in grouper.generate_fixtures_with_ids()]
+    plan = grouper.get_sample_plan(5, random.Random(1))
+    assert plan == grouper.get_sample_plan(5, random.Random(1))
+    assert len(plan['ids']) == len(set(plan['ids'])) == 5
+    assert set(plan['ids']) <= set(all_ids)
+    assert set(plan['fixtures']) == set(itertools.chain(*(ids.split('|') for ids in plan['ids'])))
+    assert len(grouper.get_sample_plan(1.0, random.Random(1))['ids']) == len(all_ids)
+
+
+def test_sample_option(testdir):
+    testdir.makepyfile("""
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{'a': ['#1', '#2', '#3'], 'b': ['#1', '#2', '#3', '#4'], 'c': ['#1', '#2']}]
+
+        def test_fn(self, a, b, c):
+            pass
+
+    @pytest.mark.matrix(names=['a'], combs=[{'a': ['#1', '#2', '#3', '#4']}])
+    def test_marker(a):
+        pass
+    """)
+    result = testdir.runpytest('-v', '--matrix-sample=4', '--matrix-seed=7')
+    result.assert_outcomes(passed=8)
+    result.stdout.fnmatch_lines(['matrix: sample 4, seed 7*'])
+    selected = sorted(line for line in result.outlines if 'PASSED' in line)
+    result = testdir.runpytest('-v', '--matrix-sample=4', '--matrix-seed=7')
+    assert sorted(line for line in result.outlines if 'PASSED' in line) == selected
+    result = testdir.runpytest('--matrix-sample=0.5')
+    result.assert_outcomes(passed=12 + 4)
+    result = testdir.runpytest('--matrix-sample=0')
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+pytest.importorskip('xdist')
+
+from pytest_matrix.scheduling import get_affinity_key  # noqa: E402
+
+
+def test_affinity_key():
+    fixtures = [('backend', 'backend_postgres'), ('cache', 'cache_redis'), ('queue', 'queue_rabbit')]
+    assert get_affinity_key(fixtures, {}) is None
+    assert get_affinity_key(fixtures, {}, ['cache']) == ('cache', 'cache_redis')
+    assert get_affinity_key(fixtures, {'queue': {'queue_rabbit': 2.0}, 'backend': {'backend_postgres': 1.0}}) == \
+        ('queue', 'queue_rabbit')
+    assert get_affinity_key(fixtures, {'queue': {'queue_rabbit': 2.0}}, ['cache']) == ('cache', 'cache_redis')
+    assert get_affinity_key([('a', '1'), ('b', '1')], {'a': {'2': 2.0}, 'b': {'1': 1.0}}) == ('b', '1')
+    assert get_affinity_key([], {}) is None
+
+
+def test_affinity_scheduling(testdir):
+    testdir.makepyfile("""
+    import os
+    import pytest
+
+    COMBS = [{'backend': ['a', 'b', 'c', 'd'], 'cache': ['#1', '#2', '#3', '#4']}]
+
+    @pytest.fixture
+    def backend_a():
+        return 'a'
+
+    backend_b = backend_c = backend_d = backend_a
+
+    @pytest.mark.matrix(names=['backend', 'cache'], combs=COMBS)
+    def test_fn(request, backend, cache):
+        with open(os.path.join(str(request.config.rootdir), 'workers.txt'), 'a') as f:
+            f.write(request.node.callspec.id.split('|')[1] + ' ' + os.environ['PYTEST_XDIST_WORKER'] + '\\n')
+    """)
+    testdir.makeini("""
+    [pytest]
+    matrix_affinity_fixtures = backend
+    """)
+    result = testdir.runpytest('-n', '2', '--matrix-affinity')
+    result.assert_outcomes(passed=16)
+    workers = {}
+    for line in testdir.tmpdir.join('workers.txt').readlines():
+        fixture_id, worker = line.split()
+        workers.setdefault(fixture_id, set()).add(worker)
+    assert len(workers) == 4
+    assert all(len(fixture_workers) == 1 for fixture_workers in workers.values())
+
+
+def test_affinity_recorded_costs(testdir):
+    testdir.makepyfile("""
+    import os
+    import time
+    import pytest
+
+    COMBS = [{'backend': ['a', 'b', 'c', 'd'], 'cache': ['#1', '#2', '#3', '#4']}]
+
+    @pytest.fixture
+    def backend_a(request):
+        time.sleep(0.1)
+        return request.fixturename
+
+    backend_b = backend_a
+
+    @pytest.fixture
+    def backend_c(request):
+        return request.fixturename
+
+    backend_d = backend_c
+
+    @pytest.mark.matrix(names=['backend', 'cache'], combs=COMBS)
+    def test_fn(request, backend, cache):
+        if 'PYTEST_XDIST_WORKER' in os.environ:
+            with open(os.path.join(str(request.config.rootdir), 'workers.txt'), 'a') as f:
+                f.write(backend + ' ' + os.environ['PYTEST_XDIST_WORKER'] + '\\n')
+
+    @pytest.mark.parametrize('value', [1, 2])
+    def test_other(value):
+        pass
+    """)
+    testdir.runpytest('-p', 'no:xdist', '--matrix-affinity').assert_outcomes(passed=18)
+    costs = json.loads(testdir.tmpdir.join('.pytest_cache', 'v', 'matrix', 'setup_costs').read())
+    assert sorted(costs) == ['backend', 'cache']
+    assert sorted(costs['backend']) == ['backend_a', 'backend_b', 'backend_c', 'backend_d']
+    assert sorted(costs['cache']) == ['1', '2', '3', '4']
+    assert costs['backend']['backend_a'] > max(costs['cache'].values()) > costs['backend']['backend_c']
+
+    testdir.runpytest('-n', '2', '--matrix-affinity').assert_outcomes(passed=18)
+    workers = {}
+    for line in testdir.tmpdir.join('workers.txt').readlines():
+        backend, worker = line.split()
+        workers.setdefault(backend, set()).add(worker)
+    assert len(workers['backend_a']) == 1
+    assert len(workers['backend_b']) == 1
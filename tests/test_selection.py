@@ -0,0 +1,239 @@
+import itertools
+import json
+
+import pytest
+
+from pytest_matrix.selection import (FailureIndex, get_coverage_units, get_failure_inducing, parse_duration,
+                                     select_by_budget, select_covering, update_failures)
+
+
+@pytest.mark.parametrize('value, seconds', [
+    ('90', 90),
+    ('1.5', 1.5),
+    ('90s', 90),
+    ('10m', 600),
+    ('1h', 3600),
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == seconds
+
+
+@pytest.mark.parametrize('value', ['', 'm', '10d', '-1'])
+def test_parse_invalid_duration(value):
+    with pytest.raises(ValueError):
+        parse_duration(value)
+
+
+def test_coverage_units():
+    assert get_coverage_units(['b', 'a', 'c']) == {('a', 'b'), ('a', 'c'), ('b', 'c')}
+    assert get_coverage_units(['a']) == {('a',)}
+
+
+def test_select_by_budget():
+    candidates = [
+        ({'ab'}, 10),
+        ({'ab', 'ac', 'bc'}, 3),
+        ({'ab', 'ac'}, 1),
+        ({'bc'}, 1),
+        ({'cd'}, 20),
+    ]
+    assert select_by_budget(candidates, 2) == {2, 3}
+    assert select_by_budget(candidates, 4) == {2, 3}
+    assert select_by_budget(candidates, 15) == {0, 1, 2, 3}
+    assert select_by_budget(candidates, 0) == set()
+
+
+def test_select_covering():
+    candidates = [
+        ({'ab'}, 1),
+        ({'ab', 'ac', 'bc'}, 1),
+        ({'ab', 'ac'}, 1),
+        ({'cd'}, 1),
+    ]
+    assert select_covering(candidates) == ({1, 3}, float('inf'))
+    assert select_covering(candidates, 1) == ({1}, 0)
+
+
+def test_failure_inducing():
+    results = {
+        ('a1', 'b1', 'c1'): True,
+        ('a1', 'b1', 'c2'): True,
+        ('a1', 'b2', 'c1'): False,
+        ('a2', 'b1', 'c2'): False,
+        ('a2', 'b2', 'c1'): False,
+    }
+    assert get_failure_inducing(results) == [('a1', 'b1'), ('a1', 'c2'), ('b1', 'c1')]
+    results[('a1', 'b2', 'c2')] = False
+    results[('a2', 'b1', 'c1')] = False
+    assert get_failure_inducing(results) == [('a1', 'b1')]
+    results[('a1', 'b1', 'c2')] = False
+    assert get_failure_inducing(results) == []
+    assert get_failure_inducing(results, max_size=3) == [('a1', 'b1', 'c1')]
+
+
+def test_update_failures():
+    results = {
+        ('a1', 'b1', 'c1'): True,
+        ('a1', 'b2', 'c1'): False,
+        ('a2', 'b1', 'c2'): False,
+        ('a2', 'b2', 'c2'): True,
+    }
+    failures = update_failures(None, results)
+    assert failures == {'combinations': [['a1', 'b1', 'c1'], ['a2', 'b2', 'c2']],
+                        'pairs': [['a1', 'b1'], ['a2', 'b2'], ['b1', 'c1'], ['b2', 'c2']]}
+
+    failures = update_failures(failures, {('a1', 'b1', 'c2'): False, ('a2', 'b2', 'c1'): True})
+    assert failures == {'combinations': [['a1', 'b1', 'c1'], ['a2', 'b2', 'c1'], ['a2', 'b2', 'c2']],
+                        'pairs': [['a2', 'b2'], ['b1', 'c1'], ['b2', 'c2']]}
+
+    failures = update_failures(failures, {('a1', 'b3', 'c3'): True})
+    assert failures['pairs'] == [['a1', 'b3'], ['a1', 'c3'], ['a2', 'b2'], ['b1', 'c1'], ['b2', 'c2'], ['b3', 'c3']]
+
+    assert update_failures(failures, {combination: False for combination in [
+        ('a1', 'b1', 'c1'), ('a2', 'b2', 'c1'), ('a2', 'b2', 'c2'), ('a1', 'b3', 'c3')]}) is None
+
+
+def test_update_failures_rerun():
+    results = {(a, b, c): (a, b) == ('a2', 'b5')
+               for a, b, c in itertools.product(['a1', 'a2', 'a3'], ['b4', 'b5'], ['c6', 'c7', 'c8'])}
+    failures = update_failures(None, results)
+    assert failures['pairs'] == [['a2', 'b5']]
+
+    rerun = {tuple(combination): True for combination in failures['combinations']}
+    assert update_failures(failures, rerun) == failures
+
+
+def test_failure_index():
+    index = FailureIndex({'combinations': [['a1', 'b1', 'c1'], ['a2', 'b2', 'c1']], 'pairs': [['a1', 'b1']]})
+    assert index.get_score(['a1', 'b1', 'c2']) == (1, 2)
+    assert index.get_score(['a1', 'b2', 'c2']) == (0, 2)
+    assert index.get_score(['a3', 'b3', 'c2']) == (0, 0)
+    assert index.get_score(['a1', 'b1', 'c1']) == (1, 3)
+
+
+def test_time_budget(testdir):
+    testdir.makepyfile("""
+    from pytest_matrix import TestMatrixMixin
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{'a': ['#1', '#2'], 'b': ['#3', '#4'], 'c': ['#5', '#6']}]
+
+        def test_fn(self, a, b, c):
+            pass
+
+    def test_other():
+        pass
+    """)
+    testdir.runpytest().assert_outcomes(passed=9)
+    cache = testdir.tmpdir.join('.pytest_cache', 'v', 'matrix', 'durations')
+    durations = json.loads(cache.read())
+    assert set(durations['test_time_budget.py::TestSuite::test_fn']) == {
+        '1|3|5', '1|3|6', '1|4|5', '1|4|6', '2|3|5', '2|3|6', '2|4|5', '2|4|6'}
+
+    durations = dict.fromkeys(durations['test_time_budget.py::TestSuite::test_fn'], 1)
+    durations['1|3|5'] = 10
+    cache.write(json.dumps({'test_time_budget.py::TestSuite::test_fn': durations}))
+    result = testdir.runpytest('--matrix-time-budget=3', '-v')
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines(['*test_other PASSED*',
+                                 'matrix time budget: selected 3 of 8 combinations, estimated 3.0s of 3.0s'])
+    assert '1|3|5' not in result.stdout.str()
+
+    result = testdir.runpytest('--matrix-time-budget=1x')
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
+
+
+def test_last_failed(testdir):
+    source = """
+    from pytest_matrix import TestMatrixMixin
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{'a': %r, 'b': ['#3', '#4'], 'c': ['#5', '#6']}]
+
+        def test_fn(self, a, b, c):
+            assert (a, b) != (2, 4)
+
+    def test_other():
+        pass
+    """
+    testdir.makepyfile(source % ['#1', '#2'])
+    testdir.runpytest().assert_outcomes(passed=7, failed=2)
+    cache = testdir.tmpdir.join('.pytest_cache', 'v', 'matrix', 'failures')
+    assert json.loads(cache.read()) == {'test_last_failed.py::TestSuite::test_fn': {
+        'combinations': [['2', '4', '5'], ['2', '4', '6']], 'pairs': [['2', '4']]}}
+
+    testdir.makepyfile(source % ['#0', '#1', '#2'])
+    result = testdir.runpytest('--matrix-lf', '-v')
+    result.assert_outcomes(passed=1, failed=2)
+    result.stdout.fnmatch_lines(['matrix last failed: selected 2 of 12 combinations'])
+
+    result = testdir.runpytest('--matrix-ff', '-v')
+    result.assert_outcomes(passed=11, failed=2)
+    lines = [line for line in result.stdout.lines if ' PASSED' in line or ' FAILED' in line]
+    assert all('[2|4|' in line for line in lines[:2])
+    assert all('[2|' in line or '|4|' in line for line in lines[2:6])
+
+    testdir.makepyfile(source.replace('assert', 'assert True or') % ['#1', '#2'])
+    testdir.runpytest().assert_outcomes(passed=9)
+    assert json.loads(cache.read()) == {}
+
+
+def test_adaptive(testdir):
+    testdir.makepyfile("""
+    from pytest_matrix import TestMatrixMixin
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{'a': ['#1', '#2', '#3'], 'b': ['#4', '#5', '#6'], 'c': ['#7', '#8', '#9']}]
+
+        def test_fn(self, a, b, c):
+            assert (a, b) != (2, 5)
+
+    def test_other():
+        pass
+    """)
+    result = testdir.runpytest('--matrix-adaptive', '-v')
+    outcomes = result.parseoutcomes()
+    assert outcomes['failed'] == 3
+    assert outcomes['passed'] < 27
+    result.stdout.fnmatch_lines(['*= matrix adaptive =*',
+                                 'ran * of 27 combinations, * added around failures',
+                                 '*::TestSuite::test_fn: failure-inducing values: 2|5'])
+
+
+@pytest.mark.parametrize('failing, order, setups', [
+    ((1, 4), ['1|3|5', '1|4|6', '2|3|6', '1|3|6', '1|4|5', '2|4|6', '2|4|5'], 1),
+    ((2, 4), ['1|3|5', '1|4|6', '2|3|6', '2|4|5', '1|4|5', '2|3|5', '2|4|6'], 2),
+])
+def test_adaptive_teardown(testdir, failing, order, setups):
+    testdir.makepyfile("""
+    import pytest
+    from pytest_matrix import TestMatrixMixin
+
+    @pytest.fixture(scope='session')
+    def resource():
+        with open('events.txt', 'a') as f:
+            f.write('setup\\n')
+        yield
+
+    class TestSuite(TestMatrixMixin):
+        FN_FIXTURES = [{'a': ['#1', '#2'], 'b': ['#3', '#4'], 'c': ['#5', '#6']}]
+
+        def test_fn(self, a, b, c, resource):
+            assert (a, b) != %r
+    """ % (failing,))
+    result = testdir.runpytest('--matrix-adaptive', '-v')
+    result.assert_outcomes(passed=5, failed=2)
+    assert [line.split('[')[1].split(']')[0] for line in result.stdout.lines if '::test_fn[' in line
+            and line.endswith('%]')] == order
+    assert testdir.tmpdir.join('events.txt').read().splitlines() == ['setup'] * setups
+
+
+def test_adaptive_xdist(testdir):
+    pytest.importorskip('xdist')
+    testdir.makepyfile("""
+    def test_fn():
+        pass
+    """)
+    result = testdir.runpytest('--matrix-adaptive', '-n', '2')
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
+    result.stderr.fnmatch_lines(['*--matrix-adaptive is not supported with pytest-xdist*'])